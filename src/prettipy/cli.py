@@ -27,6 +27,28 @@ from .core import PrettipyConverter
 from .github_handler import GitHubHandler, GitHubHandlerError
 
 
+def _non_negative_int(value: str) -> int:
+    """
+    Parse a command-line value that must be zero or a positive integer.
+
+    Args:
+        value: Raw argument value
+
+    Returns:
+        The parsed integer
+
+    Raises:
+        argparse.ArgumentTypeError: If the value is not an integer or is negative
+    """
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: '{value}'")
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"must be 0 or a positive number, got {number}")
+    return number
+
+
 class CLI:
     """Command-line interface handler."""
 
@@ -152,6 +174,13 @@ For more information, visit: https://github.com/yourusername/prettipy
             help="Apply black formatting to code before processing to ensure consistent layout",
         )
 
+        parser.add_argument(
+            "-j",
+            "--workers",
+            type=_non_negative_int,
+            help="Number of processes for syntax highlighting; 0 uses one per CPU (default: 1)",
+        )
+
         parser.add_argument(
             "--github",
             dest="github_url",
@@ -283,6 +312,9 @@ For more information, visit: https://github.com/yourusername/prettipy
             if args.lint:
                 config.lint = True
 
+            if args.workers is not None:
+                config.workers = args.workers
+
             if args.title:
                 config.title = args.title
 
@@ -69,6 +69,9 @@ class PrettipyConfig:
     # Linting
     lint: bool = False  # Apply black formatting to code before processing
 
+    # Parallelism
+    workers: int = 1  # Processes for syntax highlighting (1 = serial, 0 = one per CPU)
+
     # Output
     output_file: str = "output.pdf"
     verbose: bool = False
@@ -76,6 +79,16 @@ class PrettipyConfig:
     # Source reference (e.g., GitHub URL for cloned repositories)
     source_url: Optional[str] = None
 
+    def __post_init__(self):
+        """
+        Validate option values.
+
+        Raises:
+            ValueError: If workers is negative
+        """
+        if self.workers < 0:
+            raise ValueError(f"workers must be 0 or a positive number, got {self.workers}")
+
     @classmethod
     def from_file(cls, config_path: Path) -> "PrettipyConfig":
         """
@@ -90,6 +103,7 @@ class PrettipyConfig:
         Raises:
             FileNotFoundError: If config file doesn't exist
             json.JSONDecodeError: If config file is invalid JSON
+            ValueError: If an option has an invalid value
         """
         with open(config_path, "r") as f:
             data = json.load(f)
@@ -125,6 +139,7 @@ class PrettipyConfig:
             "reverse_deps": self.reverse_deps,
             "include_ipynb": self.include_ipynb,
             "lint": self.lint,
+            "workers": self.workers,
             "output_file": self.output_file,
             "verbose": self.verbose,
             "source_url": self.source_url,
@@ -133,24 +148,61 @@ class PrettipyConfig:
         with open(config_path, "w") as f:
             json.dump(data, f, indent=2)
 
-    def should_exclude_path(self, path: Path) -> bool:
+    def is_excluded_name(self, name: str) -> bool:
         """
-        Check if a path should be excluded from processing.
+        Check if a single path component is excluded.
+
+        Args:
+            name: File or directory name
+
+        Returns:
+            True if the name is an excluded directory or a hidden entry
+        """
+        return name in self.exclude_dirs or name.startswith(".")
+
+    def has_excluded_part(self, path: Path) -> bool:
+        """
+        Check if any component of a path is excluded.
 
         Args:
             path: Path to check
 
         Returns:
-            True if path should be excluded, False otherwise
+            True if any part of the path is excluded, False otherwise
         """
-        # Check if any part of the path is in excluded directories
         for part in path.parts:
-            if part in self.exclude_dirs or part.startswith("."):
+            if self.is_excluded_name(part):
                 return True
+        return False
 
-        # Check exclude patterns
+    def matches_exclude_pattern(self, path: Path) -> bool:
+        """
+        Check if a path matches any of the exclude patterns.
+
+        Args:
+            path: Path to check
+
+        Returns:
+            True if the path matches an exclude pattern, False otherwise
+        """
         for pattern in self.exclude_patterns:
             if path.match(pattern):
                 return True
-
         return False
+
+    def should_exclude_path(self, path: Path) -> bool:
+        """
+        Check if a path should be excluded from processing.
+
+        Args:
+            path: Path to check
+
+        Returns:
+            True if path should be excluded, False otherwise
+        """
+        # Check if any part of the path is in excluded directories
+        if self.has_excluded_part(path):
+            return True
+
+        # Check exclude patterns
+        return self.matches_exclude_pattern(path)
@@ -5,26 +5,304 @@ This module contains the main converter class that orchestrates
 the entire PDF generation process.
 """
 
+import fnmatch
 import html
+import os
+import re
 import black
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, Iterator, List, Optional, Pattern, Tuple
+from reportlab.lib.geomutils import normalizeTRBL
 from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, Table, TableStyle
-from reportlab.lib import colors
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
+from reportlab.lib.styles import ParagraphStyle
 
 from .config import PrettipyConfig
 from .formatter import CodeFormatter
 from .syntax import SyntaxHighlighter
+from .linking import SymbolTracker
 from .styles import StyleManager
 from .sorting import sort_files
 from .tree import DirectoryTreeGenerator
 from .ipynb_converter import NotebookConverter
 
+# Include patterns that only match a file extension, e.g. "*.py"
+_SUFFIX_PATTERN_RE = re.compile(r"\*\.[^*?\[\]/]+\Z")
+
+# Characters that html.escape would replace
+_HTML_SPECIAL_RE = re.compile(r"[&<>\"']")
+
+
+def _escape_html(text: str) -> str:
+    """
+    Escape text for ReportLab markup, skipping the work for plain strings.
+
+    Args:
+        text: Text to escape
+
+    Returns:
+        The text itself if it has no special characters, else html.escape(text)
+    """
+    if _HTML_SPECIAL_RE.search(text) is None:
+        return text
+    return html.escape(text)
+
+
+def _compile_path_pattern(pattern: str) -> Tuple[Optional[Pattern], ...]:
+    """
+    Compile an include pattern with directory parts into per-component matchers.
+
+    A leading ``**`` is implied, as with ``Path.rglob``, so the pattern
+    matches the trailing components of a path relative to the walk root.
+
+    Args:
+        pattern: Glob pattern such as "src/*.py" or "pkg/**/*.py"
+
+    Returns:
+        One compiled regex per component, with None standing for "**"
+    """
+    parts = [part for part in pattern.split("/") if part not in ("", ".")]
+    return (None,) + tuple(
+        None if part == "**" else re.compile(fnmatch.translate(part)) for part in parts
+    )
+
+
+def _match_path_parts(parts: List[str], matchers: Tuple[Optional[Pattern], ...]) -> bool:
+    """
+    Check whether path components match a compiled path pattern.
+
+    Args:
+        parts: Components of the path relative to the walk root
+        matchers: Result of _compile_path_pattern
+
+    Returns:
+        True if every component is matched, with None matching zero or more
+    """
+    if not matchers:
+        return not parts
+    first = matchers[0]
+    rest = matchers[1:]
+    if first is None:
+        return any(_match_path_parts(parts[i:], rest) for i in range(len(parts) + 1))
+    return bool(parts) and first.match(parts[0]) is not None and _match_path_parts(parts[1:], rest)
+
+
+def _matches_include_path(
+    relative_path: str, include_paths: Tuple[Tuple[Optional[Pattern], ...], ...]
+) -> bool:
+    """
+    Check whether a path relative to the walk root matches any path pattern.
+
+    Args:
+        relative_path: Path relative to the walk root, using os.sep
+        include_paths: Patterns compiled by _compile_path_pattern
+
+    Returns:
+        True if any of the patterns matches the path
+    """
+    parts = relative_path.split(os.sep)
+    return any(_match_path_parts(parts, matchers) for matchers in include_paths)
+
+
+def _split_include_patterns(
+    patterns: List[str],
+) -> Tuple[Tuple[str, ...], Optional[Pattern], Tuple[Tuple[Optional[Pattern], ...], ...]]:
+    """
+    Sort include patterns by how the directory walk matches them.
+
+    Plain extension patterns like "*.py" are checked with one str.endswith,
+    other name patterns are compiled into one regex matched against file
+    names, and patterns with directory parts are matched against the path
+    relative to the walk root.
+
+    Args:
+        patterns: Include glob patterns
+
+    Returns:
+        Tuple of (file name suffixes, name regex or None, compiled path patterns)
+    """
+    suffixes = []
+    name_patterns = []
+    path_patterns = []
+    for pattern in patterns:
+        if _SUFFIX_PATTERN_RE.match(pattern):
+            suffixes.append(pattern[1:])
+        elif "/" in pattern:
+            path_patterns.append(_compile_path_pattern(pattern))
+        else:
+            name_patterns.append(pattern)
+    name_re = (
+        re.compile("|".join(fnmatch.translate(p) for p in name_patterns)) if name_patterns else None
+    )
+    return tuple(suffixes), name_re, tuple(path_patterns)
+
+
+def _relative_display_path(path: Path, root_prefix: str) -> str:
+    """
+    Get a display string for a path relative to the document root.
+
+    Uses a string prefix test instead of ``Path.relative_to`` so that the
+    common case does not go through exception handling.
+
+    Args:
+        path: Path to display
+        root_prefix: Root directory string ending with a path separator
+
+    Returns:
+        The path relative to the root if it lies under it, else the full path
+    """
+    path_str = str(path)
+    if path_str.startswith(root_prefix):
+        return path_str[len(root_prefix) :]
+    return path_str
+
+
+def _read_source(path: Path) -> str:
+    """
+    Read and decode a source file in a single read.
+
+    Bypasses the TextIOWrapper used by ``Path.read_text`` while keeping its
+    universal-newline behaviour.
+
+    Args:
+        path: File to read
+
+    Returns:
+        Decoded file contents with normalized line endings
+    """
+    text = path.read_bytes().decode("utf-8")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+# Per-process state for parallel highlighting, set up by _init_highlight_worker
+_worker_highlighter: Optional[SyntaxHighlighter] = None
+_worker_black_mode: Optional[black.Mode] = None
+
+
+def _init_highlight_worker(
+    black_line_length: Optional[int], definitions: Optional[Dict[str, str]]
+) -> None:
+    """
+    Build the highlighter used by a highlighting worker process.
+
+    Args:
+        black_line_length: Line length for black formatting, or None to skip it
+        definitions: Symbol definitions from the linking pre-pass, or None
+                     when auto-linking is disabled
+    """
+    global _worker_highlighter, _worker_black_mode
+    _worker_highlighter = SyntaxHighlighter(enable_linking=definitions is not None)
+    if definitions is not None:
+        tracker = SymbolTracker()
+        tracker.definitions = definitions
+        # Every definition gets an anchor somewhere, so references may link to it
+        tracker.anchors_created.update(definitions)
+        _worker_highlighter.symbol_tracker = tracker
+    _worker_black_mode = (
+        black.Mode(line_length=black_line_length) if black_line_length is not None else None
+    )
+
+
+def _highlight_in_worker(code: str) -> Optional[Tuple[List[str], List[str]]]:
+    """
+    Optionally format and then highlight one file's code in a worker process.
+
+    Args:
+        code: Source code of the file
+
+    Returns:
+        Tuple of (highlighted HTML lines, names of symbols anchored in them),
+        or None if highlighting failed
+    """
+    tracker = _worker_highlighter.symbol_tracker
+    try:
+        if _worker_black_mode is not None:
+            try:
+                code = black.format_str(code, mode=_worker_black_mode)
+            except Exception:
+                # If black fails (e.g. syntax error), use original code
+                pass
+        if tracker is None:
+            return _worker_highlighter.highlight_code_multiline_aware(code), []
+        # Anchor each definition in this file; the parent drops the ones an
+        # earlier file already placed
+        tracker.anchors_placed.clear()
+        lines = _worker_highlighter.highlight_code_multiline_aware(code)
+        return lines, list(tracker.anchors_placed)
+    except Exception:
+        # Let the serial path reproduce and report the error
+        return None
+
+
+class _CodeChunk(Paragraph):
+    """
+    Paragraph holding a run of lines from a code block.
+
+    ReportLab can only draw a full box around a paragraph, so the block
+    outline is drawn here instead: both sides of every chunk, the top edge
+    where the block or a page starts and the bottom edge where it ends.
+    """
+
+    # Width of the code block outline, in points
+    OUTLINE_WIDTH = 1
+
+    def __init__(self, text, style, top: bool = False, bottom: bool = False, **kwargs):
+        super().__init__(text, style, **kwargs)
+        self.top = top
+        self.bottom = bottom
+
+    def split(self, availWidth, availHeight):
+        parts = super().split(availWidth, availHeight)
+        if len(parts) == 2:
+            # Close the outline at the page break and reopen it on the next page
+            first, rest = parts
+            first.top, first.bottom = self.top, True
+            rest.top, rest.bottom = True, self.bottom
+        return parts
+
+    def draw(self):
+        super().draw()
+        style = self.style
+        if style.borderColor is None:
+            return
+
+        # Same rectangle drawPara fills with the background color
+        top_pad, right_pad, bottom_pad, left_pad = normalizeTRBL(style.borderPadding)
+        x0 = style.leftIndent - left_pad
+        x1 = self.width - style.rightIndent + right_pad
+        y0 = -bottom_pad
+        y1 = self.height + top_pad
+
+        canvas = self.canv
+        canvas.saveState()
+        canvas.setStrokeColor(style.borderColor)
+        canvas.setLineWidth(self.OUTLINE_WIDTH)
+        canvas.line(x0, y0, x0, y1)
+        canvas.line(x1, y0, x1, y1)
+        if self.top:
+            canvas.line(x0, y1, x1, y1)
+        if self.bottom:
+            canvas.line(x0, y0, x1, y0)
+        canvas.restoreState()
+
 
 class PrettipyConverter:
     """Main converter class for Python code to PDF."""
 
+    # Maximum number of code lines per Paragraph in a rendered code block
+    CODE_BLOCK_CHUNK_LINES = 20
+
+    # Upper bound on threads used to read source files concurrently
+    MAX_READ_WORKERS = 32
+
+    # File header prefixes for regular Python files and converted notebooks
+    FILE_HEADER_PREFIX = "📄 "
+    NOTEBOOK_HEADER_PREFIX = "📓 "
+
     def __init__(self, config: Optional[PrettipyConfig] = None):
         """
         Initialize the converter.
@@ -50,27 +328,40 @@ class PrettipyConverter:
             List of Path objects for Python files, sorted according to config
         """
         py_files = []
-        patterns = list(self.config.include_patterns)
+        config = self.config
 
-        # Add .ipynb if enabled
-        if self.config.include_ipynb:
-            patterns.append("*.ipynb")
+        include_patterns = list(config.include_patterns)
+        if config.include_ipynb:
+            include_patterns.append("*.ipynb")
+        include_suffixes, include_re, include_paths = _split_include_patterns(include_patterns)
 
         notebook_converter = (
-            NotebookConverter(verbose=self.config.verbose) if self.config.include_ipynb else None
+            NotebookConverter(verbose=config.verbose) if config.include_ipynb else None
         )
 
-        for pattern in patterns:
-            for file_path in directory.rglob(pattern):
-                if not self.config.should_exclude_path(file_path):
-                    if file_path.suffix == ".ipynb" and notebook_converter:
-                        # Convert notebook to temporary Python file
-                        temp_py = notebook_converter.create_temp_python_file(file_path)
-                        if temp_py:
-                            py_files.append(temp_py)
-                            self.ipynb_to_py_map[temp_py] = file_path
-                    else:
-                        py_files.append(file_path)
+        # Directory-level exclusion decisions, computed once per directory
+        # instead of re-testing every parent component for each file
+        excluded_dirs: Dict[Path, bool] = {}
+
+        for file_path in self._walk_files(directory, include_suffixes, include_re, include_paths):
+            parent = file_path.parent
+            dir_excluded = excluded_dirs.get(parent)
+            if dir_excluded is None:
+                dir_excluded = excluded_dirs[parent] = config.has_excluded_part(parent)
+
+            if not (
+                dir_excluded
+                or config.is_excluded_name(file_path.name)
+                or config.matches_exclude_pattern(file_path)
+            ):
+                if file_path.suffix == ".ipynb" and notebook_converter:
+                    # Convert notebook to temporary Python file
+                    temp_py = notebook_converter.create_temp_python_file(file_path)
+                    if temp_py:
+                        py_files.append(temp_py)
+                        self.ipynb_to_py_map[temp_py] = file_path
+                else:
+                    py_files.append(file_path)
 
         # Apply sorting based on configuration
         try:
@@ -86,6 +377,54 @@ class PrettipyConverter:
                 print("Falling back to lexicographic sorting")
             return sort_files(py_files, method="lexicographic")
 
+    def _walk_files(
+        self,
+        directory: Path,
+        include_suffixes: Tuple[str, ...],
+        include_re: Optional[Pattern],
+        include_paths: Tuple[Tuple[Optional[Pattern], ...], ...],
+    ) -> Iterator[Path]:
+        """
+        Recursively yield files that match an include suffix or pattern.
+
+        Excluded directories are pruned before descending into them, so
+        large trees such as ``venv`` or ``.git`` are never scanned.
+
+        Args:
+            directory: Root directory to walk
+            include_suffixes: File name endings that are always included
+            include_re: Compiled pattern for other file names, or None
+            include_paths: Compiled patterns matched against the path relative
+                to ``directory``, from _compile_path_pattern
+
+        Yields:
+            Path objects for matching files
+        """
+        is_excluded_name = self.config.is_excluded_name
+        root_len = len(os.path.join(str(directory), ""))
+        stack = [str(directory)]
+
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as entries:
+                    for entry in entries:
+                        name = entry.name
+                        if entry.is_dir(follow_symlinks=False):
+                            if not is_excluded_name(name):
+                                stack.append(entry.path)
+                        elif (
+                            name.endswith(include_suffixes)
+                            or (include_re is not None and include_re.match(name))
+                            or (
+                                include_paths
+                                and _matches_include_path(entry.path[root_len:], include_paths)
+                            )
+                        ) and entry.is_file():
+                            yield Path(entry.path)
+            except OSError:
+                # Unreadable directory - skip it like rglob would
+                continue
+
     def convert_directory(self, directory: str = ".", output: Optional[str] = None):
         """
         Convert all Python files in a directory to PDF.
@@ -115,12 +454,10 @@ class PrettipyConverter:
 
         if self.config.verbose:
             print(f"Found {len(py_files)} Python files")
+            root_prefix = os.path.join(str(root), "")
             for f in py_files:
                 display_path = self.ipynb_to_py_map.get(f, f)
-                try:
-                    print(f"  - {display_path.relative_to(root)}")
-                except ValueError:
-                    print(f"  - {display_path}")
+                print(f"  - {_relative_display_path(display_path, root_prefix)}")
 
         self._generate_pdf(root, py_files, output_path)
 
@@ -153,8 +490,12 @@ class PrettipyConverter:
         """
         Create a code block from highlighted lines.
 
-        This method creates individual Paragraph elements for each line
-        to ensure proper line spacing and prevent overlapping text.
+        Lines are joined with line breaks into Paragraphs of at most
+        CODE_BLOCK_CHUNK_LINES lines instead of one Paragraph per line in a
+        table, which avoids the table re-measuring every cell at each page
+        break. Each chunk still wraps long lines, and ReportLab only has to
+        re-split a short chunk when a page ends inside it. The chunks draw
+        the 1pt outline the table used to put around the whole block.
 
         Args:
             highlighted_lines: List of HTML-highlighted code lines
@@ -162,36 +503,144 @@ class PrettipyConverter:
         Returns:
             List of flowable elements to add to the story
         """
-        # Create a table with one column to simulate a bordered code block
-        # Each row contains one line of code
-        table_data = []
-        for line in highlighted_lines:
-            # Create a paragraph for each line with no vertical spacing
-            para = Paragraph(line, self.styles["code_line"])
-            table_data.append([para])
-
-        # Create the table
-        code_table = Table(
-            table_data,
-            colWidths=[None],  # Auto width
-        )
+        chunk_style = self.styles["code_chunk"]
+        chunk_size = self.CODE_BLOCK_CHUNK_LINES
+        # Blank lines are highlighted as a bare break; a non-breaking space
+        # keeps them, even at the end of a chunk, once lines are joined
+        lines = ["&nbsp;" if line == "<br/>" else line for line in highlighted_lines]
+        last_start = (len(lines) - 1) // chunk_size * chunk_size
+        elements = []
+
+        for start in range(0, len(lines), chunk_size):
+            style = chunk_style
+            if start == 0 or start == last_start:
+                # Pad the top of the first chunk and the bottom of the last one
+                # so the block keeps its margins around the code
+                top = 6 if start == 0 else 0
+                bottom = 6 if start == last_start else 0
+                style = ParagraphStyle(
+                    f"{chunk_style.name}-{top}-{bottom}",
+                    parent=chunk_style,
+                    borderPadding=(top, 12, bottom, 12),
+                    spaceBefore=top,
+                    spaceAfter=bottom,
+                )
+            elements.append(
+                _CodeChunk(
+                    "<br/>".join(lines[start : start + chunk_size]),
+                    style,
+                    top=start == 0,
+                    bottom=start == last_start,
+                )
+            )
+
+        elements.append(Spacer(1, 10))
+        return elements
+
+    def _read_sources(self, files: List[Path]) -> Dict[Path, str]:
+        """
+        Read and decode source files concurrently.
+
+        File reads are I/O bound and release the GIL, so a small thread pool
+        overlaps their latency. Files that fail to read are left out; the
+        render loop reads them again and reports the error in the PDF.
+
+        Args:
+            files: List of Python files to read
+
+        Returns:
+            Dictionary mapping each readable file to its decoded text
+        """
+        # Read each path once even if it is listed more than once
+        files = list(dict.fromkeys(files))
+
+        def read(file_path: Path):
+            try:
+                return file_path, _read_source(file_path)
+            except Exception:
+                return file_path, None
+
+        if len(files) <= 1:
+            results = [read(file_path) for file_path in files]
+        else:
+            workers = min(self.MAX_READ_WORKERS, len(files))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(read, files))
+
+        return {file_path: code for file_path, code in results if code is not None}
+
+    def _highlight_parallel(
+        self, files: List[Path], sources: Dict[Path, str]
+    ) -> Dict[Path, List[str]]:
+        """
+        Highlight files in a pool of worker processes.
 
-        # Apply table styling to create the code block appearance
-        code_table.setStyle(
-            TableStyle(
-                [
-                    ("BACKGROUND", (0, 0), (-1, -1), colors.HexColor("#f8f8f8")),
-                    ("BOX", (0, 0), (-1, -1), 1, colors.HexColor("#e0e0e0")),
-                    ("LEFTPADDING", (0, 0), (-1, -1), 12),
-                    ("RIGHTPADDING", (0, 0), (-1, -1), 12),
-                    ("TOPPADDING", (0, 0), (-1, -1), 6),
-                    ("BOTTOMPADDING", (0, 0), (-1, -1), 6),
-                    ("VALIGN", (0, 0), (-1, -1), "TOP"),
-                ]
+        Highlighting is CPU bound and each file is independent once the
+        linking pre-pass has collected all definitions, so it parallelizes
+        across processes. Workers get a snapshot of the definitions and
+        anchor every definition site they see; anchors are then kept only
+        in the first file, in document order, that places them, matching
+        serial highlighting.
+
+        Args:
+            files: Files to highlight, in document order
+            sources: Decoded source text for each readable file
+
+        Returns:
+            Dictionary mapping files to their highlighted lines. Files that
+            could not be read or highlighted are omitted.
+        """
+        todo = [file_path for file_path in dict.fromkeys(files) if file_path in sources]
+        workers = self.config.workers or os.cpu_count() or 1
+        workers = min(workers, len(todo))
+        if workers < 2:
+            return {}
+
+        tracker = self.highlighter.symbol_tracker if self.config.enable_linking else None
+        definitions = tracker.definitions if tracker else None
+        black_line_length = self.config.max_line_width if self.config.lint else None
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_highlight_worker,
+            initargs=(black_line_length, definitions),
+        ) as executor:
+            results = executor.map(
+                _highlight_in_worker, [sources[file_path] for file_path in todo], chunksize=4
             )
-        )
+            highlighted = dict(zip(todo, results))
+
+        output = {}
+        for file_path, result in highlighted.items():
+            if result is None:
+                continue
+            lines, anchored = result
+            if tracker is not None and anchored:
+                duplicates = [name for name in anchored if name in tracker.anchors_placed]
+                if duplicates:
+                    lines = self._strip_anchors(lines, tracker, duplicates)
+                for name in anchored:
+                    tracker.mark_anchor_placed(name)
+            output[file_path] = lines
+
+        return output
+
+    @staticmethod
+    def _strip_anchors(lines: List[str], tracker: SymbolTracker, names: List[str]) -> List[str]:
+        """
+        Remove the definition anchors for the given symbols from highlighted lines.
 
-        return [code_table, Spacer(1, 10)]
+        Args:
+            lines: Highlighted HTML lines
+            tracker: Symbol tracker used to name the anchors
+            names: Symbols whose anchors should be removed
+
+        Returns:
+            Highlighted lines without those anchors
+        """
+        anchor_re = re.compile(
+            "|".join(re.escape(f'<a name="{tracker.get_anchor_name(name)}"></a>') for name in names)
+        )
+        return [anchor_re.sub("", line) if "<a name=" in line else line for line in lines]
 
     def _generate_pdf(self, root: Path, files: List[Path], output_path: str):
         """
@@ -218,12 +667,17 @@ class PrettipyConverter:
 
         story = []
 
+        # Read all sources up front; shared by the linking pre-pass and render loop
+        sources = self._read_sources(files)
+
         # Pre-analyze all files for linking if enabled
         if self.config.enable_linking:
-            for file_path in files:
+            prepare_for_linking = self.highlighter.prepare_for_linking
+            # Tokens are only reused when this process highlights the unchanged code
+            keep_tokens = self.config.workers == 1 and not self.config.lint
+            for code in sources.values():
                 try:
-                    code = file_path.read_text(encoding="utf-8")
-                    self.highlighter.prepare_for_linking(code, clear_existing=False)
+                    prepare_for_linking(code, clear_existing=False, keep_tokens=keep_tokens)
                 except Exception:
                     continue
             # Reset anchors so they can be created during the actual highlighting phase
@@ -231,14 +685,14 @@ class PrettipyConverter:
 
         # Title page
         title = self.config.title or f"Python Scripts from {root.name}/"
-        story.append(Paragraph(html.escape(title), self.styles["title"]))
+        story.append(Paragraph(_escape_html(title), self.styles["title"]))
         story.append(Paragraph(f"<b>Total files:</b> {len(files)}", self.styles["info"]))
 
         # Use source_url if available (e.g., GitHub URL), otherwise use local path
         source_reference = self.config.source_url if self.config.source_url else str(root)
         story.append(
             Paragraph(
-                f"<b>Generated from:</b> {html.escape(source_reference)}", self.styles["info"]
+                f"<b>Generated from:</b> {_escape_html(source_reference)}", self.styles["info"]
             )
         )
         story.append(Spacer(1, 0.3 * 72))  # 0.3 inch
@@ -294,80 +748,113 @@ class PrettipyConverter:
             for symbol in self.highlighter.symbol_tracker.definitions.keys():
                 self.highlighter.symbol_tracker.mark_anchor_created(symbol)
 
+        # The back link is the same for every file header
+        back_link_html = ""
+        if tree_anchor_exists:
+            back_link_html = f' <font size="9"><a href="#{tree_anchor_name}" color="blue"><u>← Back</u></a></font>'
+
+        # Highlight in worker processes if requested
+        highlighted: Dict[Path, List[str]] = {}
+        if self.config.workers != 1:
+            highlighted = self._highlight_parallel(files, sources)
+
+        # Root with a trailing separator, for cheap relative-path prefix checks
+        root_prefix = os.path.join(str(root), "")
+
+        # Bind per-file lookups to locals once instead of on every iteration
+        ipynb_to_py_map = self.ipynb_to_py_map
+        show_directory_tree = self.config.show_directory_tree
+        file_header_style = self.styles["file_header"]
+        error_style = self.styles["error"]
+        highlight = self.highlighter.highlight_code_multiline_aware
+        create_code_block = self._create_code_block
+        story_append = story.append
+        story_extend = story.extend
+        black_mode = (
+            black.Mode(line_length=self.config.max_line_width) if self.config.lint else None
+        )
+
+        # Cached sources and highlighting are freed after a file's last use
+        remaining_uses = Counter(files)
+        # A definition is anchored only once, so with linking a repeated file
+        # is highlighted again instead of reusing its worker result
+        reuse_highlighted = not self.config.enable_linking
+
         # Process each file
         for idx, file_path in enumerate(files):
             if idx > 0:
-                story.append(PageBreak())
+                story_append(PageBreak())
 
             # Check if this is a converted notebook file
-            original_ipynb_path = self.ipynb_to_py_map.get(file_path)
+            original_ipynb_path = ipynb_to_py_map.get(file_path)
 
             # Determine the display path and file to read from
             if original_ipynb_path:
                 # For converted notebooks, show the original .ipynb name in PDF
-                try:
-                    display_path = original_ipynb_path.relative_to(root)
-                except ValueError:
-                    display_path = original_ipynb_path
+                display_str = _relative_display_path(original_ipynb_path, root_prefix)
                 # Use a notebook emoji for .ipynb files
-                file_emoji = "📓"
+                header_prefix = self.NOTEBOOK_HEADER_PREFIX
             else:
                 # For regular .py files
-                try:
-                    display_path = file_path.relative_to(root)
-                except ValueError:
-                    display_path = file_path
-                file_emoji = "📄"
+                display_str = _relative_display_path(file_path, root_prefix)
+                header_prefix = self.FILE_HEADER_PREFIX
 
             # Get anchor for this file if directory tree is enabled
-            anchor_name = (
-                file_to_anchor.get(str(display_path), "") if self.config.show_directory_tree else ""
-            )
-
-            back_link_html = ""
-            if tree_anchor_exists:
-                back_link_html = f' <font size="9"><a href="#{tree_anchor_name}" color="blue"><u>← Back</u></a></font>'
+            anchor_name = file_to_anchor.get(display_str, "") if show_directory_tree else ""
 
             # File header with emoji, anchor, and back link
-            emoji = "📓" if file_path in self.ipynb_to_py_map else "📄"
-            if anchor_name:
-                # Add anchor to the file header so links from tree work
-                file_header_html = (
-                    f'<a name="{anchor_name}"/>{file_emoji} {html.escape(str(display_path))}'
-                )
-            else:
-                file_header_html = f"{emoji} {html.escape(str(display_path))}"
+            # Add anchor to the file header so links from tree work
+            anchor_html = f'<a name="{anchor_name}"/>' if anchor_name else ""
+            file_header_html = "".join(
+                (anchor_html, header_prefix, _escape_html(display_str), back_link_html)
+            )
 
-            if back_link_html:
-                file_header_html = f"{file_header_html}{back_link_html}"
+            story_append(Paragraph(file_header_html, file_header_style))
 
-            story.append(Paragraph(file_header_html, self.styles["file_header"]))
+            # Keep cached data for a file that is listed again later
+            remaining_uses[file_path] -= 1
+            keep = remaining_uses[file_path] > 0
 
             # Process file content
             try:
-                code = file_path.read_text(encoding="utf-8")
-
-                # Format code with black before highlighting if linting is enabled
-                if self.config.lint:
-                    try:
-                        mode = black.Mode(line_length=self.config.max_line_width)
-                        code = black.format_str(code, mode=mode)
-                    except Exception:
-                        # If black fails (e.g. syntax error), use original code
-                        pass
-
-                # Highlight with multiline awareness
-                # This correctly handles triple-quoted strings and other multiline constructs
-                highlighted_lines = self.highlighter.highlight_code_multiline_aware(code)
-
-                # Create code block using individual paragraphs for each line
-                # This prevents line overlapping issues that occur with <br/> tags
-                code_elements = self._create_code_block(highlighted_lines)
-                story.extend(code_elements)
+                # Use the worker result if this file was highlighted in parallel
+                if keep and reuse_highlighted:
+                    highlighted_lines = highlighted.get(file_path)
+                else:
+                    highlighted_lines = highlighted.pop(file_path, None)
+                if highlighted_lines is None:
+                    # Reuse the up-front read if available
+                    if keep:
+                        code = sources.get(file_path)
+                    else:
+                        code = sources.pop(file_path, None)
+                    if code is None:
+                        code = _read_source(file_path)
+
+                    # Format code with black before highlighting if linting is enabled
+                    if black_mode is not None:
+                        try:
+                            code = black.format_str(code, mode=black_mode)
+                        except Exception:
+                            # If black fails (e.g. syntax error), use original code
+                            pass
+
+                    # Highlight with multiline awareness
+                    # This correctly handles triple-quoted strings and other multiline constructs
+                    highlighted_lines = highlight(code)
+                elif not keep:
+                    sources.pop(file_path, None)
+
+                # Create the outlined code block from the highlighted lines
+                code_elements = create_code_block(highlighted_lines)
+                story_extend(code_elements)
 
             except Exception as e:
-                error_msg = f"Error reading file: {html.escape(str(e))}"
-                story.append(Paragraph(f"<i>{error_msg}</i>", self.styles["error"]))
+                error_msg = f"Error reading file: {_escape_html(str(e))}"
+                story_append(Paragraph(f"<i>{error_msg}</i>", error_style))
+
+        # Tokens of files that failed to highlight are no longer needed
+        self.highlighter.clear_token_cache()
 
         # Build PDF
         doc.build(story)
@@ -8,6 +8,8 @@ preserving comment structure and breaking at natural points.
 import re
 from typing import List
 
+_NON_SPACE_RE = re.compile(r"\S")
+
 
 class CodeFormatter:
     """Handles formatting and wrapping of Python code lines."""
@@ -34,6 +36,7 @@ class CodeFormatter:
             " (",
             " [",
         ]
+        self._comment_re = re.compile(r"#.*")
 
     def wrap_line(self, line: str) -> List[str]:
         """
@@ -48,10 +51,9 @@ class CodeFormatter:
         if len(line) <= self.max_width:
             return [line]
 
-        # Check if line has a comment
-        comment_match = re.search(r"#.*", line)
-        if comment_match:
-            return self._wrap_line_with_comment(line, comment_match)
+        # Check if line has a comment; most lines have none, so skip the regex
+        if "#" in line:
+            return self._wrap_line_with_comment(line, self._comment_re.search(line))
 
         # No comment - wrap at natural break points
         return self._wrap_plain_line(line)
@@ -169,13 +171,9 @@ class CodeFormatter:
         if len(text) <= max_len:
             return len(text)
 
-        # Look for space at or before max_len
-        # We search backwards from max_len to find the last space that fits
-        for i in range(max_len, 0, -1):
-            if text[i - 1] == " ":
-                return i
-
-        return -1
+        # Look for the last space that fits and break just after it
+        space = text.rfind(" ", 0, max_len)
+        return space + 1 if space >= 0 else -1
 
     def _wrap_plain_line(self, line: str) -> List[str]:
         """
@@ -188,21 +186,34 @@ class CodeFormatter:
             List of wrapped lines
         """
         lines = []
-        current = line
         indent = len(line) - len(line.lstrip())
-        continuation_indent = indent + 4
+        continuation = " " * (indent + 4)
+        max_width = self.max_width
+
+        # The line still to wrap is `prefix + line[offset:]`; only the window
+        # that can hold the next break is built, so each split costs O(width)
+        # instead of copying the rest of the line
+        prefix = ""
+        offset = 0
+        while offset < len(line) and len(prefix) + len(line) - offset > max_width:
+            # Always take at least one character so deep indents still progress
+            window = prefix + line[offset : offset + max(max_width - len(prefix), 1)]
 
-        while len(current) > self.max_width:
             # Find the best break point
-            best_break = self._find_break_point(current, indent)
+            best_break = self._find_break_point(window, indent)
 
-            if best_break == -1 or best_break <= indent:
-                # No good break point found, break at max_width
-                best_break = self.max_width
+            if best_break <= max(indent, len(prefix)):
+                # No good break point past the indentation, break at the window end
+                best_break = len(window)
 
-            lines.append(current[:best_break].rstrip())
-            current = " " * continuation_indent + current[best_break:].lstrip()
+            lines.append(window[:best_break].rstrip())
+            offset += best_break - len(prefix)
+            # Continuation lines start at the next non-whitespace character
+            next_char = _NON_SPACE_RE.search(line, offset)
+            offset = next_char.start() if next_char else len(line)
+            prefix = continuation
 
+        current = prefix + line[offset:]
         if current.strip():
             lines.append(current)
 
@@ -222,9 +233,9 @@ class CodeFormatter:
         best_break = -1
         for char in self.break_chars:
             pos = line.rfind(char, 0, self.max_width)
+            # A later break string only wins if it starts after the current
+            # best break ends, so overlapping candidates keep the earlier one
             if pos > best_break and pos > min_pos:
-                potential_break = pos + len(char)
-                # Ensure we don't exceed max_width
-                if potential_break <= self.max_width:
-                    best_break = potential_break
+                # rfind bounded by max_width keeps the whole match within it
+                best_break = pos + len(char)
         return best_break
@@ -1,14 +1,29 @@
 """
 Jupyter Notebook to Python converter.
 
-This module handles conversion of .ipynb files to .py files using nbconvert.
+This module handles conversion of .ipynb files to .py files, producing the
+same script as nbconvert's PythonExporter.
 """
 
 import hashlib
 import json
+import os
+import stat
 import tempfile
+from importlib import metadata
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, Optional
+
+from . import __version__
+
+# Same header nbconvert's Python template writes
+SCRIPT_HEADER = "#!/usr/bin/env python\n# coding: utf-8\n"
+
+# Raw cell formats that nbconvert copies into a Python script
+RAW_MIMETYPES = ("", "text/x-python")
+
+# Bumped when converted files written by an earlier release must not be reused
+CACHE_FORMAT = 1
 
 
 class NotebookConverter:
@@ -22,10 +37,18 @@ class NotebookConverter:
             verbose: Enable verbose output
         """
         self.verbose = verbose
+        # IPython input transformer, created on first use
+        self._transformer = None
+        # nbconvert exporter for older notebook formats, created on first use
+        self._exporter = None
+        # Directory for converted notebooks, created on first use
+        self._temp_dir: Optional[Path] = None
+        # Converter versions mixed into converted file names, computed on first use
+        self._cache_salt: Optional[str] = None
 
     def convert_notebook_to_python(self, notebook_path: Path) -> Optional[str]:
         """
-        Convert a Jupyter notebook to Python code using nbconvert.
+        Convert a Jupyter notebook to Python code.
 
         Args:
             notebook_path: Path to the .ipynb file
@@ -34,70 +57,253 @@ class NotebookConverter:
             Python code as a string, or None if conversion fails
 
         Raises:
-            ImportError: If nbconvert is not installed
-            ValueError: If the notebook file is invalid
+            ImportError: If nbconvert is needed for an old notebook but is not installed
         """
         try:
-            from nbconvert import PythonExporter
-        except ImportError:
-            raise ImportError(
-                "nbconvert is required for .ipynb support. "
-                "Install it with: pip install nbconvert"
-            )
+            data = notebook_path.read_bytes()
+        except OSError as e:
+            if self.verbose:
+                print(f"Warning: Failed to convert notebook {notebook_path}: {e}")
+            return None
 
-        try:
-            # Read the notebook
-            with open(notebook_path, "r", encoding="utf-8") as f:
-                notebook_content = f.read()
+        return self.convert_notebook_bytes_to_python(data, name=str(notebook_path))
+
+    def convert_notebook_bytes_to_python(
+        self, data: bytes, name: str = "<notebook>"
+    ) -> Optional[str]:
+        """
+        Convert the raw contents of a Jupyter notebook to Python code.
+
+        nbformat 4 notebooks are converted by walking the notebook JSON
+        directly, reproducing the output of nbconvert's PythonExporter
+        without loading nbconvert and rendering its template. Older
+        notebook formats still go through nbconvert, which upgrades them.
+
+        Args:
+            data: Contents of an .ipynb file
+            name: Name of the notebook used in warnings
+
+        Returns:
+            Python code as a string, or None if conversion fails
 
+        Raises:
+            ImportError: If nbconvert is needed for an old notebook but is not installed
+        """
+        try:
             # Validate that it's a valid JSON notebook
             try:
-                json.loads(notebook_content)
+                notebook = json.loads(data)
             except json.JSONDecodeError as e:
                 if self.verbose:
-                    print(f"Warning: Invalid JSON in notebook {notebook_path}: {e}")
+                    print(f"Warning: Invalid JSON in notebook {name}: {e}")
                 return None
 
-            # Create a PythonExporter
-            # script exports only code cells, no outputs or metadata
-            exporter = PythonExporter()
-
-            # Convert the notebook
-            (body, resources) = exporter.from_filename(str(notebook_path))
+            if not isinstance(notebook, dict) or not isinstance(notebook.get("cells"), list):
+                return self._convert_with_nbconvert(notebook)
 
-            return body
+            return self._notebook_to_script(notebook)
 
+        except ImportError:
+            raise
         except Exception as e:
             if self.verbose:
-                print(f"Warning: Failed to convert notebook {notebook_path}: {e}")
+                print(f"Warning: Failed to convert notebook {name}: {e}")
             return None
 
+    def _notebook_to_script(self, notebook: Dict[str, Any]) -> str:
+        """
+        Build the Python script for a parsed nbformat 4 notebook.
+
+        Code cells get an input prompt comment, markdown cells are commented
+        out and raw cells are copied as-is, as in nbconvert's Python template.
+
+        Args:
+            notebook: Parsed notebook JSON
+
+        Returns:
+            Python code as a string
+        """
+        parts = [SCRIPT_HEADER]
+        for cell in notebook["cells"]:
+            metadata = cell.get("metadata") or {}
+            if metadata.get("transient", {}).get("remove_source", False):
+                continue
+
+            source = cell.get("source", "")
+            if isinstance(source, list):
+                source = "".join(source)
+
+            cell_type = cell.get("cell_type")
+            if cell_type == "code":
+                prompt = cell.get("execution_count") or " "
+                parts.append(f"\n# In[{prompt}]:\n\n\n{self._ipython_to_python(source)}\n")
+            elif cell_type == "markdown":
+                parts.append("\n# " + source.replace("\n", "\n# ") + "\n")
+            elif cell_type == "raw" and metadata.get("raw_mimetype", "").lower() in RAW_MIMETYPES:
+                parts.append(source)
+
+        return "".join(parts)
+
+    def _ipython_to_python(self, code: str) -> str:
+        """
+        Translate IPython syntax (magics, shell escapes) in a code cell to Python.
+
+        Args:
+            code: Source of a code cell
+
+        Returns:
+            Plain Python code, or the code unchanged if IPython is unavailable
+        """
+        if self._transformer is None:
+            try:
+                from IPython.core.inputtransformer2 import TransformerManager
+            except ImportError:
+                return code
+            self._transformer = TransformerManager()
+        return self._transformer.transform_cell(code)
+
+    def _convert_with_nbconvert(self, notebook: Any) -> Optional[str]:
+        """
+        Convert a parsed notebook with nbconvert's PythonExporter.
+
+        The notebook is upgraded to nbformat 4 in memory, so the file is not
+        read again, and one exporter is reused for every notebook.
+
+        Args:
+            notebook: Parsed notebook JSON
+
+        Returns:
+            Python code as a string
+
+        Raises:
+            ImportError: If nbconvert is not installed
+        """
+        try:
+            import nbformat
+            from nbconvert import PythonExporter
+            from nbformat.reader import get_version
+        except ImportError:
+            raise ImportError(
+                "nbconvert is required for .ipynb support. "
+                "Install it with: pip install nbconvert"
+            )
+
+        if self._exporter is None:
+            # script exports only code cells, no outputs or metadata
+            self._exporter = PythonExporter()
+
+        # Same steps as nbformat.read, starting from the already parsed JSON
+        major, minor = get_version(notebook)
+        node = nbformat.versions[major].to_notebook_json(notebook, minor=minor)
+        node = nbformat.convert(node, 4)
+        body, resources = self._exporter.from_notebook_node(node)
+        return body
+
     def create_temp_python_file(self, notebook_path: Path) -> Optional[Path]:
         """
         Convert a notebook and save it as a temporary Python file.
 
+        The temporary file is named after the notebook's path, modification
+        time and size and the versions of the converters, so an unchanged
+        notebook reuses the file written by an earlier run instead of being
+        converted again.
+
         Args:
             notebook_path: Path to the .ipynb file
 
         Returns:
             Path to the temporary .py file, or None if conversion fails
         """
+        try:
+            st = notebook_path.stat()
+        except OSError as e:
+            if self.verbose:
+                print(f"Warning: Failed to convert notebook {notebook_path}: {e}")
+            return None
+
+        if self._cache_salt is None:
+            self._cache_salt = self._converter_versions()
+
+        # Include a hash of the absolute path, file state and converter
+        # versions to ensure uniqueness
+        key = hashlib.blake2b(
+            f"{notebook_path.resolve()}:{st.st_mtime_ns}:{st.st_size}:{self._cache_salt}".encode(),
+            digest_size=8,
+        ).hexdigest()
+        temp_dir = self._temp_dir
+        if temp_dir is None:
+            temp_dir = self._temp_dir = self._make_temp_dir()
+
+        # Use base name with the key to ensure uniqueness
+        base_name = notebook_path.stem
+        temp_py_file = temp_dir / f"{base_name}_{key}.py"
+
+        # Reuse the conversion from an earlier run if it is still current
+        try:
+            if temp_py_file.stat().st_mtime_ns >= st.st_mtime_ns:
+                return temp_py_file
+        except OSError:
+            pass
+
         python_code = self.convert_notebook_to_python(notebook_path)
 
         if python_code is None:
             return None
 
-        # Create a temporary file with a unique name to avoid conflicts
-        # Include a hash of the absolute path to ensure uniqueness
-        path_hash = hashlib.md5(str(notebook_path.absolute()).encode()).hexdigest()[:8]
-        temp_dir = Path(tempfile.gettempdir()) / "prettipy_notebooks"
-        temp_dir.mkdir(exist_ok=True)
+        # Write the Python code next to its final name and move it into place,
+        # so a concurrent run never reuses a partially written file
+        partial_file = temp_py_file.with_name(f"{temp_py_file.name}.{os.getpid()}.tmp")
+        partial_file.write_bytes(python_code.encode("utf-8"))
+        os.replace(partial_file, temp_py_file)
 
-        # Use base name with path hash to ensure uniqueness
-        base_name = notebook_path.stem
-        temp_py_file = temp_dir / f"{base_name}_{path_hash}.py"
+        return temp_py_file
+
+    @staticmethod
+    def _converter_versions() -> str:
+        """
+        Describe the code that converts notebooks, for naming converted files.
 
-        # Write the Python code
-        temp_py_file.write_text(python_code, encoding="utf-8")
+        Returns:
+            The cache format and the prettipy, IPython and nbconvert versions
+        """
+        versions = [str(CACHE_FORMAT), __version__]
+        for package in ("ipython", "nbconvert"):
+            try:
+                versions.append(metadata.version(package))
+            except metadata.PackageNotFoundError:
+                versions.append("-")
+        return ":".join(versions)
 
-        return temp_py_file
+    @staticmethod
+    def _make_temp_dir() -> Path:
+        """
+        Get the directory that keeps converted notebooks across runs.
+
+        The directory is private to the current user. If it exists but is
+        not a directory owned by this user with no group or other access,
+        its files are not trusted and a new directory is used for this run.
+
+        Returns:
+            Path to the directory
+        """
+        if not hasattr(os, "getuid"):
+            # The temporary directory is already per user on Windows
+            temp_dir = Path(tempfile.gettempdir()) / "prettipy_notebooks"
+            temp_dir.mkdir(exist_ok=True)
+            return temp_dir
+
+        uid = os.getuid()
+        temp_dir = Path(tempfile.gettempdir()) / f"prettipy_notebooks-{uid}"
+        try:
+            temp_dir.mkdir(mode=0o700, exist_ok=True)
+            st = temp_dir.lstat()
+        except OSError:
+            st = None
+        if (
+            st is None
+            or not stat.S_ISDIR(st.st_mode)
+            or st.st_uid != uid
+            or st.st_mode & (stat.S_IRWXG | stat.S_IRWXO)
+        ):
+            return Path(tempfile.mkdtemp(prefix="prettipy_notebooks-"))
+        return temp_dir
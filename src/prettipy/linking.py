@@ -5,18 +5,26 @@ This module handles tracking of function, class, and variable definitions
 and creates links from references to their declarations.
 """
 
-from typing import Dict, Set, List, Tuple
+import re
+from typing import Dict, Set, List, Optional, Tuple
 from pygments.token import Token
 from pygments import lex
 from pygments.lexers import PythonLexer
 
+# Characters that are not safe in an HTML anchor name
+_ANCHOR_UNSAFE_RE = re.compile(r"[^a-zA-Z0-9_]")
+
+# Lexers keep no state between calls, so all trackers and highlighters share
+# one. Leading newlines are kept so tokens stay aligned with the code's lines
+_PYTHON_LEXER = PythonLexer(stripnl=False)
+
 
 class SymbolTracker:
     """Tracks symbols (functions, classes, variables) for auto-linking."""
 
     def __init__(self):
         """Initialize the symbol tracker."""
-        self.lexer = PythonLexer()
+        self.lexer = _PYTHON_LEXER
         # Maps symbol names to their types ('function', 'class', 'variable')
         self.definitions: Dict[str, str] = {}
         # Track which symbols have been marked as having anchors (for link creation)
@@ -29,14 +37,16 @@ class SymbolTracker:
         self.anchors_created.clear()
         self.anchors_placed.clear()
 
-    def analyze_code(self, code: str) -> None:
+    def analyze_code(self, code: str, tokens: Optional[List[Tuple]] = None) -> None:
         """
         Analyze code to find all function, class, and variable definitions.
 
         Args:
             code: The complete code to analyze
+            tokens: Optional tokens already lexed from the code
         """
-        tokens = list(lex(code, self.lexer))
+        if tokens is None:
+            tokens = list(lex(code, self.lexer))
 
         for i, (token_type, token_value) in enumerate(tokens):
             # Look for function definitions
@@ -176,7 +186,5 @@ class SymbolTracker:
         """
         # Sanitize the name to be safe for HTML attributes
         # Replace any non-alphanumeric characters (except underscore) with underscore
-        import re
-
-        sanitized = re.sub(r"[^a-zA-Z0-9_]", "_", name)
+        sanitized = _ANCHOR_UNSAFE_RE.sub("_", name)
         return f"def_{sanitized}"
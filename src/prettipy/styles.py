@@ -127,6 +127,22 @@ class StyleManager:
             alignment=TA_LEFT,
         )
 
+        # Style for multi-line code chunks; the indents plus horizontal border
+        # padding let the background span the frame width, and with no vertical
+        # padding consecutive chunks tile into one continuous block. The border
+        # color is drawn as the block outline by the code chunk flowable, so
+        # borderWidth stays 0 to keep ReportLab from boxing each chunk
+        self.code_chunk_style = ParagraphStyle(
+            "CodeChunk",
+            parent=self.code_line_style,
+            leftIndent=12,
+            rightIndent=12,
+            backColor=HexColor("#f8f8f8"),
+            borderColor=HexColor("#e0e0e0"),
+            borderWidth=0,
+            borderPadding=(0, 12, 0, 12),
+        )
+
         self.info_style = ParagraphStyle(
             "InfoStyle",
             parent=self.base_styles["Normal"],
@@ -195,6 +211,7 @@ class StyleManager:
             "file_header": self.file_header_style,
             "code": self.code_container_style,
             "code_line": self.code_line_style,
+            "code_chunk": self.code_chunk_style,
             "info": self.info_style,
             "error": self.error_style,
             "tree": self.tree_style,
@@ -5,12 +5,44 @@ This module handles syntax highlighting using Pygments,
 converting tokens to HTML with appropriate colors.
 """
 
-import html
 from typing import List, Tuple, Dict, Optional
 from pygments import lex
-from pygments.lexers import PythonLexer
 from pygments.token import Token
-from .linking import SymbolTracker
+from .linking import SymbolTracker, _PYTHON_LEXER
+
+# Marks token types whose color has not been looked up yet
+_UNRESOLVED = object()
+
+
+def _escape_token(text: str) -> str:
+    """
+    Escape a token for ReportLab markup, keeping its spaces and tabs visible.
+
+    Produces the same result as ``html.escape`` followed by replacing spaces
+    and tabs with non-breaking spaces, but only runs the replacements for
+    characters the token contains; most tokens contain none.
+
+    Args:
+        text: Token text
+
+    Returns:
+        Escaped text
+    """
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    if '"' in text:
+        text = text.replace('"', "&quot;")
+    if "'" in text:
+        text = text.replace("'", "&#x27;")
+    if " " in text:
+        text = text.replace(" ", "&nbsp;")
+    if "\t" in text:
+        text = text.replace("\t", "&nbsp;&nbsp;&nbsp;&nbsp;")
+    return text
 
 
 class SyntaxHighlighter:
@@ -35,6 +67,9 @@ class SyntaxHighlighter:
     MAX_LOOKBACK_TOKENS = 5  # How many tokens to look back for def/class keywords
     MAX_LOOKAHEAD_TOKENS = 5  # How many tokens to look ahead for assignment operators
 
+    # Maximum number of files whose linking-pass tokens are kept for highlighting
+    TOKEN_CACHE_SIZE = 256
+
     def __init__(self, color_scheme: Dict = None, enable_linking: bool = True):
         """
         Initialize the syntax highlighter.
@@ -44,24 +79,41 @@ class SyntaxHighlighter:
                          If None, uses DEFAULT_COLORS.
             enable_linking: Whether to enable auto-linking to definitions.
         """
-        self.lexer = PythonLexer()
+        self.lexer = _PYTHON_LEXER
         self.color_scheme = color_scheme or self.DEFAULT_COLORS
+        # Resolved color (or None) per exact token type
+        self._color_cache: Dict[Token, Optional[str]] = {}
         self.enable_linking = enable_linking
         self.symbol_tracker: Optional[SymbolTracker] = None
+        # Tokens lexed by prepare_for_linking, each reused once by highlighting
+        self._token_cache: Dict[str, List[Tuple]] = {}
 
-    def prepare_for_linking(self, code: str, clear_existing: bool = True) -> None:
+    def prepare_for_linking(
+        self, code: str, clear_existing: bool = True, keep_tokens: bool = False
+    ) -> None:
         """
         Prepare the highlighter for auto-linking by analyzing the code.
 
         Args:
             code: The complete code to analyze for symbols
             clear_existing: Whether to clear existing definitions
+            keep_tokens: Whether to keep the lexed tokens for highlighting the
+                same code later in this process. Kept tokens are freed when that
+                code is highlighted or by clear_token_cache.
         """
         if self.enable_linking:
             if self.symbol_tracker is None or clear_existing:
                 self.symbol_tracker = SymbolTracker()
 
-            self.symbol_tracker.analyze_code(code)
+            tokens = list(lex(code, self.lexer))
+            self.symbol_tracker.analyze_code(code, tokens)
+            # Keep the tokens so highlighting the same code does not lex it again
+            if keep_tokens and len(self._token_cache) < self.TOKEN_CACHE_SIZE:
+                self._token_cache[code] = tokens
+
+    def clear_token_cache(self) -> None:
+        """Drop tokens kept by prepare_for_linking that were never highlighted."""
+        self._token_cache.clear()
 
     def reset_anchors(self) -> None:
         """Reset the anchor tracking to allow creating anchors in a new document."""
@@ -81,13 +133,7 @@ class SyntaxHighlighter:
         if not line.strip():
             return "<br/>"
 
-        tokens = list(lex(line, self.lexer))
-        colored_parts = []
-
-        for i, (token_type, token_value) in enumerate(tokens):
-            colored_parts.append(self._colorize_token(token_type, token_value, tokens, i))
-
-        return "".join(colored_parts)
+        return "<br/>".join(self.highlight_code_multiline_aware(line))
 
     def _colorize_token(
         self, token_type: Token, token_value: str, tokens: List[Tuple] = None, token_idx: int = 0
@@ -104,11 +150,12 @@ class SyntaxHighlighter:
         Returns:
             HTML string with color formatting and optional linking
         """
-        # Escape HTML special characters
-        escaped = html.escape(token_value)
-        # Preserve spaces and tabs
-        escaped = escaped.replace(" ", "&nbsp;")
-        escaped = escaped.replace("\t", "&nbsp;&nbsp;&nbsp;&nbsp;")
+        # Whitespace is never colored or linked, so only needs escaping
+        if token_value.isspace():
+            return _escape_token(token_value)
+
+        # Escape HTML special characters and preserve spaces and tabs
+        escaped = _escape_token(token_value)
 
         # Find matching color
         color = self._get_token_color(token_type)
@@ -199,15 +246,23 @@ class SyntaxHighlighter:
         Returns:
             Hex color string or None
         """
-        for ttype, color in self.color_scheme.items():
-            if token_type in ttype:
-                return color
-        return None
+        color = self._color_cache.get(token_type, _UNRESOLVED)
+        if color is _UNRESOLVED:
+            # Token types are shared singletons, so each is resolved only once
+            color = next(
+                (value for ttype, value in self.color_scheme.items() if token_type in ttype),
+                None,
+            )
+            self._color_cache[token_type] = color
+        return color
 
     def highlight_code(self, code: str, lines: List[str] = None) -> str:
         """
         Highlight an entire code block.
 
+        The code is tokenized in a single pass, so multiline strings are
+        highlighted correctly.
+
         Args:
             code: Full code string
             lines: Optional pre-split lines (if already processed)
@@ -215,11 +270,13 @@ class SyntaxHighlighter:
         Returns:
             HTML string with all lines highlighted
         """
-        if lines is None:
-            lines = code.split("\n")
+        if lines is not None:
+            code = "\n".join(lines)
+
+        if not code:
+            return "<br/>"
 
-        highlighted_lines = [self.highlight_line(line) for line in lines]
-        return "<br/>".join(highlighted_lines)
+        return "<br/>".join(self.highlight_code_multiline_aware(code))
 
     def highlight_code_multiline_aware(self, code: str) -> List[str]:
         """
@@ -238,35 +295,47 @@ class SyntaxHighlighter:
         if not code:
             return []
 
-        # Tokenize the entire code block
-        tokens = list(lex(code, self.lexer))
+        # Tokenize the entire code block, unless the linking pass already did
+        tokens = self._token_cache.pop(code, None)
+        if tokens is None:
+            tokens = list(lex(code, self.lexer))
 
-        # Split code into lines to track line boundaries
-        lines = code.split("\n")
+        # Only the number of lines is needed to track line boundaries
+        num_lines = code.count("\n") + 1
+        colorize = self._colorize_token
 
-        # Build highlighted HTML for each line
-        highlighted_lines = [""] * len(lines)
-        current_line = 0
+        # Build highlighted HTML for each line from the parts of the current
+        # line, joined once at each line boundary; empty lines become <br/>
+        result: List[str] = []
+        parts: List[str] = []
 
         for token_idx, (token_type, token_value) in enumerate(tokens):
-            # Split token value by newlines to handle multiline tokens
-            token_lines = token_value.split("\n")
+            if "\n" not in token_value:
+                # Most tokens sit within one line
+                if token_value:
+                    # Pass tokens and index for linking support
+                    parts.append(colorize(token_type, token_value, tokens, token_idx))
+                continue
 
-            for i, line_part in enumerate(token_lines):
+            # Split token value by newlines to handle multiline tokens
+            for i, line_part in enumerate(token_value.split("\n")):
                 if i > 0:
                     # New line boundary
-                    current_line += 1
-
-                if current_line >= len(lines):
-                    break
+                    result.append("".join(parts) or "<br/>")
+                    parts = []
+                    if len(result) == num_lines:
+                        break
 
                 if line_part:
                     # Colorize the entire line part as one unit
-                    # Pass tokens and index for linking support
-                    highlighted_part = self._colorize_token(
-                        token_type, line_part, tokens, token_idx
-                    )
-                    highlighted_lines[current_line] += highlighted_part
+                    parts.append(colorize(token_type, line_part, tokens, token_idx))
+
+            if len(result) == num_lines:
+                break
+
+        # Close the last line and any lines the tokens did not reach
+        if len(result) < num_lines:
+            result.append("".join(parts) or "<br/>")
+            result.extend(["<br/>"] * (num_lines - len(result)))
 
-        # Convert empty lines to <br/>
-        return [line if line else "<br/>" for line in highlighted_lines]
+        return result
@@ -110,6 +110,18 @@ class DirectoryTreeGenerator:
         # Create anchor mappings for all files
         file_to_anchor = self.create_file_anchors(files, root_path)
 
+        # Resolve each file's name and anchor once, rather than calling
+        # relative_to for every file on every line of the tree
+        links = []
+        for file_path in files:
+            try:
+                rel_path = file_path.relative_to(root_path)
+            except ValueError:
+                continue
+            anchor = file_to_anchor.get(str(rel_path))
+            if anchor:
+                links.append((rel_path.name, anchor))
+
         # Convert tree text to HTML with links
         html_lines = []
         for line in tree_text.split("\n"):
@@ -119,29 +131,21 @@ class DirectoryTreeGenerator:
 
             # Check if this line contains a file that's in our PDF
             linked = False
-            for file_path in files:
-                try:
-                    rel_path = file_path.relative_to(root_path)
-                    filename = rel_path.name
-
+            if not line.strip().endswith("/"):
+                for filename, anchor in links:
                     # If the filename appears in this line
-                    if filename in line and not line.strip().endswith("/"):
-                        # Get the anchor for this file
-                        anchor = file_to_anchor.get(str(rel_path))
-                        if anchor:
-                            # Replace the filename with a linked version
-                            # Use blue color for links
-                            escaped_line = html.escape(line)
-                            escaped_filename = html.escape(filename)
-                            linked_line = escaped_line.replace(
-                                escaped_filename,
-                                f'<a href="#{anchor}" color="blue"><u>{escaped_filename}</u></a>',
-                            )
-                            html_lines.append(linked_line)
-                            linked = True
-                            break
-                except ValueError:
-                    continue
+                    if filename in line:
+                        # Replace the filename with a linked version
+                        # Use blue color for links
+                        escaped_line = html.escape(line)
+                        escaped_filename = html.escape(filename)
+                        linked_line = escaped_line.replace(
+                            escaped_filename,
+                            f'<a href="#{anchor}" color="blue"><u>{escaped_filename}</u></a>',
+                        )
+                        html_lines.append(linked_line)
+                        linked = True
+                        break
 
             if not linked:
                 # No link needed, just escape and add
@@ -0,0 +1,71 @@
+"""Shared fixtures for the prettipy test suite."""
+
+import json
+
+import pytest
+
+from prettipy.syntax import SyntaxHighlighter
+
+# Minimal valid Jupyter notebook shared by the tests
+SAMPLE_NOTEBOOK = {
+    "cells": [
+        {
+            "cell_type": "code",
+            "execution_count": 1,
+            "metadata": {},
+            "outputs": [{"name": "stdout", "output_type": "stream", "text": ["Output only\n"]}],
+            "source": ["print('Hello from notebook')\n", "x = 42\n"],
+        },
+        {
+            "cell_type": "code",
+            "execution_count": 2,
+            "metadata": {},
+            "outputs": [],
+            "source": ["def add(a, b):\n", "    return a + b\n"],
+        },
+        {
+            "cell_type": "markdown",
+            "metadata": {},
+            "source": [
+                "# This is a markdown cell\n",
+                "It should not appear in the Python output",
+            ],
+        },
+    ],
+    "metadata": {
+        "kernelspec": {
+            "display_name": "Python 3",
+            "language": "python",
+            "name": "python3",
+        },
+        "language_info": {"name": "python", "version": "3.8.0"},
+    },
+    "nbformat": 4,
+    "nbformat_minor": 4,
+}
+
+
+@pytest.fixture(scope="session")
+def sample_notebook_bytes() -> bytes:
+    """Serialize the sample notebook once for the whole test session."""
+    return json.dumps(SAMPLE_NOTEBOOK).encode("utf-8")
+
+
+@pytest.fixture(scope="session")
+def pdf_output_dir(tmp_path_factory):
+    """Create one directory for the PDFs written by the whole test session."""
+    return tmp_path_factory.mktemp("pdf_output")
+
+
+@pytest.fixture
+def output_pdf(pdf_output_dir):
+    """Return an emptied output path for tests that only check the PDF was written."""
+    path = pdf_output_dir / "output.pdf"
+    path.unlink(missing_ok=True)
+    return path
+
+
+@pytest.fixture(scope="session")
+def highlighter():
+    """Share one highlighter, built once per xdist worker, for tests that only read output."""
+    return SyntaxHighlighter()
@@ -17,3 +17,13 @@ class TestCLIArgumentValidation:
         )
 
         assert result == 1, "Should return error code when --github and --files are both used"
+
+    def test_negative_workers_rejected(self, capsys):
+        """Test that a negative --workers value is rejected by the parser."""
+        cli = CLI()
+
+        with pytest.raises(SystemExit) as exc_info:
+            cli.run(["-j", "-3", "-o", "test.pdf"])
+
+        assert exc_info.value.code == 2
+        assert "must be 0 or a positive number, got -3" in capsys.readouterr().err
@@ -52,6 +52,28 @@ class TestPrettipyConfig:
         assert loaded_config.page_size == "a4"
         assert loaded_config.title == "Test Project"
 
+    def test_negative_workers_rejected(self, tmp_path):
+        """Test that a negative worker count is rejected when loading a config."""
+        config_file = tmp_path / "test_config.json"
+        config_file.write_text(json.dumps({"workers": -3}))
+
+        with pytest.raises(ValueError, match="workers"):
+            PrettipyConfig.from_file(config_file)
+
+    def test_exclusion_helpers(self):
+        """Test the component and pattern checks used by should_exclude_path."""
+        config = PrettipyConfig(exclude_patterns=["*_test.py"])
+
+        assert config.is_excluded_name("venv")
+        assert config.is_excluded_name(".hidden")
+        assert not config.is_excluded_name("src")
+
+        assert config.has_excluded_part(Path("project/__pycache__"))
+        assert not config.has_excluded_part(Path("project/src"))
+
+        assert config.matches_exclude_pattern(Path("src/example_test.py"))
+        assert not config.matches_exclude_pattern(Path("src/example.py"))
+
     def test_exclude_patterns(self):
         """Test exclude patterns functionality."""
         config = PrettipyConfig(exclude_patterns=["*_test.py"])
@@ -2,7 +2,14 @@
 
 import pytest
 from pathlib import Path
-from prettipy.core import PrettipyConverter
+import os
+from prettipy.core import (
+    PrettipyConverter,
+    _CodeChunk,
+    _escape_html,
+    _relative_display_path,
+    _split_include_patterns,
+)
 from prettipy.config import PrettipyConfig
 
 
@@ -44,6 +51,90 @@ class TestPrettipyConverter:
         assert "utils.py" in file_names
         assert "ignored.py" not in file_names
 
+    def test_find_python_files_nested_and_pruned(self, tmp_path):
+        """Test that nested files are found and excluded directories are skipped."""
+        pkg_dir = tmp_path / "pkg" / "sub"
+        pkg_dir.mkdir(parents=True)
+        (pkg_dir / "module.py").write_text("x = 1")
+
+        for excluded in (".git", "__pycache__", "node_modules"):
+            excluded_dir = tmp_path / excluded / "deep"
+            excluded_dir.mkdir(parents=True)
+            (excluded_dir / "hidden.py").write_text("# should be ignored")
+
+        # A directory whose name matches the include pattern is not a file
+        (tmp_path / "fake.py").mkdir()
+
+        converter = PrettipyConverter(PrettipyConfig(sort_method="lexicographic"))
+        files = converter.find_python_files(tmp_path)
+
+        assert files == [pkg_dir / "module.py"]
+
+    def test_find_python_files_multiple_include_patterns(self, tmp_path):
+        """Test that every include pattern is matched in a single walk."""
+        (tmp_path / "module.py").write_text("x = 1")
+        (tmp_path / "module.pyi").write_text("x: int")
+        (tmp_path / "notes.txt").write_text("not code")
+
+        config = PrettipyConfig(include_patterns=["*.py", "*.pyi"], sort_method="lexicographic")
+        converter = PrettipyConverter(config)
+        files = converter.find_python_files(tmp_path)
+
+        assert [f.name for f in files] == ["module.py", "module.pyi"]
+
+    def test_find_python_files_overlapping_patterns_no_duplicates(self, tmp_path):
+        """Test that a file matched by several include patterns is listed once."""
+        (tmp_path / "main.py").write_text("print('main')")
+        (tmp_path / "helper.py").write_text("def helper(): pass")
+
+        config = PrettipyConfig(include_patterns=["*.py", "m*.py", "*"], sort_method="none")
+        converter = PrettipyConverter(config)
+        files = converter.find_python_files(tmp_path)
+
+        assert sorted(f.name for f in files) == ["helper.py", "main.py"]
+
+    def test_find_python_files_suffix_and_glob_patterns(self, tmp_path):
+        """Test that extension patterns and other globs are both honoured."""
+        (tmp_path / "module.py").write_text("x = 1")
+        (tmp_path / "setup.cfg").write_text("[metadata]")
+        (tmp_path / "notes.txt").write_text("not code")
+
+        config = PrettipyConfig(include_patterns=["*.py", "setup.*"], sort_method="lexicographic")
+        converter = PrettipyConverter(config)
+        files = converter.find_python_files(tmp_path)
+
+        assert _split_include_patterns(config.include_patterns)[0] == (".py",)
+        assert [f.name for f in files] == ["module.py", "setup.cfg"]
+
+    def test_find_python_files_path_patterns(self, tmp_path):
+        """Test that patterns with directory parts or ** match like rglob."""
+        nested = tmp_path / "src" / "a"
+        nested.mkdir(parents=True)
+        (nested / "x.py").write_text("x = 1")
+        (tmp_path / "src" / "b.py").write_text("b = 1")
+        (tmp_path / "y.py").write_text("y = 1")
+
+        for pattern in ["**/*.py", "src/**/*.py", "src/*.py", "a/*.py"]:
+            config = PrettipyConfig(include_patterns=[pattern], sort_method="lexicographic")
+            files = PrettipyConverter(config).find_python_files(tmp_path)
+            expected = sorted(p for p in tmp_path.rglob(pattern) if p.is_file())
+            assert sorted(files) == expected, pattern
+            assert files
+
+    def test_find_python_files_exclude_patterns(self, tmp_path):
+        """Test that exclude patterns and hidden files are applied per file."""
+        tests_dir = tmp_path / "tests"
+        tests_dir.mkdir()
+        (tests_dir / "helper.py").write_text("x = 1")
+        (tests_dir / "example_test.py").write_text("assert True")
+        (tests_dir / ".hidden.py").write_text("secret = 1")
+
+        config = PrettipyConfig(exclude_patterns=["*_test.py"])
+        converter = PrettipyConverter(config)
+        files = converter.find_python_files(tmp_path)
+
+        assert [f.name for f in files] == ["helper.py"]
+
     def test_convert_directory_creates_pdf(self, tmp_path):
         """Test that convert_directory creates a PDF file."""
         # Create a test Python file
@@ -131,3 +222,257 @@ class TestPrettipyConverter:
 
         # Verify that the config has the source_url
         assert converter.config.source_url == github_url
+
+    def test_file_headers_have_prefix_anchor_and_back_link(self, tmp_path, monkeypatch):
+        """Test the generated file header markup."""
+        from prettipy import core
+
+        (tmp_path / "a&b.py").write_text("x = 1")
+
+        captured = {}
+        monkeypatch.setattr(
+            core.SimpleDocTemplate, "build", lambda self, story: captured.update(story=story)
+        )
+
+        converter = PrettipyConverter(PrettipyConfig(show_directory_tree=True))
+        converter.convert_directory(str(tmp_path), str(tmp_path / "output.pdf"))
+
+        headers = [
+            p.text
+            for p in captured["story"]
+            if getattr(p, "style", None) is converter.styles["file_header"]
+        ]
+        assert len(headers) == 1
+        assert headers[0].startswith('<a name="')
+        assert "📄 a&amp;b.py" in headers[0]
+        assert headers[0].endswith("← Back</u></a></font>")
+
+    def test_highlight_parallel_matches_serial(self, tmp_path):
+        """Test that worker processes produce the same highlighting as the serial path."""
+        files = []
+        for i in range(4):
+            path = tmp_path / f"mod_{i}.py"
+            path.write_text(f'def func_{i}():\n    """Doc {i}."""\n    return {i}\n')
+            files.append(path)
+
+        config = PrettipyConfig(enable_linking=False, workers=2)
+        converter = PrettipyConverter(config)
+        sources = converter._read_sources(files)
+
+        highlighted = converter._highlight_parallel(files, sources)
+
+        assert list(highlighted) == files
+        for path in files:
+            expected = converter.highlighter.highlight_code_multiline_aware(sources[path])
+            assert highlighted[path] == expected
+
+    def test_highlight_parallel_with_linking_matches_serial(self, tmp_path):
+        """Test that parallel highlighting places each definition anchor once, like serial."""
+        files = []
+        for i in range(4):
+            path = tmp_path / f"mod_{i}.py"
+            # Every file redefines helper; only the first one should anchor it
+            path.write_text(f"def helper():\n    return {i}\n\nvalue_{i} = helper()\n")
+            files.append(path)
+
+        def prepared_converter():
+            converter = PrettipyConverter(PrettipyConfig(workers=2))
+            sources = converter._read_sources(files)
+            for code in sources.values():
+                converter.highlighter.prepare_for_linking(code, clear_existing=False)
+            tracker = converter.highlighter.symbol_tracker
+            for symbol in tracker.definitions:
+                tracker.mark_anchor_created(symbol)
+            return converter, sources
+
+        serial, sources = prepared_converter()
+        expected = [serial.highlighter.highlight_code_multiline_aware(sources[f]) for f in files]
+
+        converter, sources = prepared_converter()
+        highlighted = converter._highlight_parallel(files, sources)
+
+        assert [highlighted[f] for f in files] == expected
+        assert sum("".join(lines).count('<a name="def_helper">') for lines in expected) == 1
+        assert converter.highlighter.symbol_tracker.anchors_placed == (
+            serial.highlighter.symbol_tracker.anchors_placed
+        )
+
+    def test_convert_directory_with_workers(self, tmp_path):
+        """Test PDF generation with parallel highlighting enabled."""
+        for i in range(3):
+            (tmp_path / f"mod_{i}.py").write_text(f"value_{i} = {i}")
+
+        output_pdf = tmp_path / "output.pdf"
+
+        config = PrettipyConfig(workers=2)
+        converter = PrettipyConverter(config)
+        converter.convert_directory(str(tmp_path), str(output_pdf))
+
+        assert output_pdf.exists()
+        assert output_pdf.stat().st_size > 0
+
+    @pytest.mark.parametrize("options", [{}, {"lint": True}, {"workers": 2}])
+    def test_linking_tokens_released_after_conversion(self, tmp_path, options):
+        """Test that tokens kept by the linking pass do not outlive the conversion."""
+        for name in ["a", "b", "c"]:
+            (tmp_path / f"{name}.py").write_text(f"def {name}():\n    return {name!r}\n")
+
+        converter = PrettipyConverter(PrettipyConfig(enable_linking=True, **options))
+        converter.convert_directory(str(tmp_path), str(tmp_path / "output.pdf"))
+
+        assert converter.highlighter._token_cache == {}
+
+    def test_create_code_block_chunks_long_files(self):
+        """Test that long code blocks are split into bounded paragraphs."""
+        from reportlab.platypus import Paragraph, Spacer
+
+        converter = PrettipyConverter()
+        chunk = converter.CODE_BLOCK_CHUNK_LINES
+        lines = [f"x_{i}&nbsp;=&nbsp;{i}" for i in range(2 * chunk + 1)]
+        lines[1] = lines[chunk - 1] = "<br/>"
+
+        elements = converter._create_code_block(lines)
+
+        paragraphs = [e for e in elements if isinstance(e, Paragraph)]
+        assert len(paragraphs) == 3
+        # Every source line, including the blank one, keeps its own line
+        heights = [p.wrap(500, 10000)[1] for p in paragraphs]
+        leading = converter.styles["code_chunk"].leading
+        assert heights == [chunk * leading, chunk * leading, leading]
+        assert isinstance(elements[-1], Spacer)
+
+        # The outline is closed only at the ends of the block
+        assert [(p.top, p.bottom) for p in paragraphs] == [
+            (True, False),
+            (False, False),
+            (False, True),
+        ]
+
+    def test_code_block_outline(self):
+        """Test that code chunks draw side borders, closing them at block ends and page splits."""
+        from unittest.mock import MagicMock
+
+        converter = PrettipyConverter()
+        block, _ = converter._create_code_block([f"x_{i}" for i in range(10)])
+        leading = converter.styles["code_chunk"].leading
+
+        def outline_lines(paragraph):
+            paragraph.wrap(500, 10000)
+            paragraph.canv = MagicMock()
+            paragraph.draw()
+            return paragraph.canv.line.call_count
+
+        # A block on one page is boxed in; a page split closes and reopens it
+        assert outline_lines(block) == 4
+        first, rest = block.split(500, 4 * leading)
+        assert (first.top, first.bottom, rest.top, rest.bottom) == (True, True, True, True)
+        middle = _CodeChunk("x", converter.styles["code_chunk"])
+        assert outline_lines(middle) == 2
+
+    def test_convert_long_file_creates_pdf(self, tmp_path):
+        """Test that a file spanning many pages and chunks renders."""
+        test_file = tmp_path / "long.py"
+        test_file.write_text("\n".join(f"value_{i} = {i}" for i in range(500)))
+
+        output_pdf = tmp_path / "long.pdf"
+
+        converter = PrettipyConverter()
+        converter.convert_directory(str(tmp_path), str(output_pdf))
+
+        assert output_pdf.exists()
+        assert output_pdf.stat().st_size > 0
+
+    def test_linking_reads_each_file_once(self, tmp_path, monkeypatch):
+        """Test that the linking pre-pass and rendering share one read per file."""
+        (tmp_path / "a.py").write_text("def helper():\n    pass")
+        (tmp_path / "b.py").write_text("helper()")
+
+        reads = []
+        original_read_bytes = Path.read_bytes
+
+        def counting_read_bytes(self):
+            reads.append(self.name)
+            return original_read_bytes(self)
+
+        monkeypatch.setattr(Path, "read_bytes", counting_read_bytes)
+
+        config = PrettipyConfig(enable_linking=True, show_directory_tree=False)
+        converter = PrettipyConverter(config)
+        converter.convert_directory(str(tmp_path), str(tmp_path / "output.pdf"))
+
+        assert sorted(r for r in reads if r.endswith(".py")) == ["a.py", "b.py"]
+
+    def test_duplicate_files_read_once(self, tmp_path, monkeypatch):
+        """Test that a file passed twice is read once and rendered twice."""
+        path = tmp_path / "dup.py"
+        path.write_text("x = 1")
+
+        reads = []
+        original_read_bytes = Path.read_bytes
+
+        def counting_read_bytes(self):
+            reads.append(self.name)
+            return original_read_bytes(self)
+
+        monkeypatch.setattr(Path, "read_bytes", counting_read_bytes)
+
+        output_pdf = tmp_path / "output.pdf"
+        converter = PrettipyConverter()
+        converter.convert_files([str(path), str(path)], str(output_pdf))
+
+        assert reads == ["dup.py"]
+        assert output_pdf.exists()
+
+    def test_read_sources_skips_unreadable_files(self, tmp_path):
+        """Test that concurrent reads return decoded text and skip failures."""
+        good = [tmp_path / f"mod_{i}.py" for i in range(5)]
+        for i, path in enumerate(good):
+            path.write_text(f"x = {i}")
+        bad = tmp_path / "bad.py"
+        bad.write_bytes(b"\xff\xfe invalid utf-8")
+
+        converter = PrettipyConverter()
+        sources = converter._read_sources(good + [bad, tmp_path / "missing.py"])
+
+        assert set(sources) == set(good)
+        assert sources[good[3]] == "x = 3"
+
+    def test_read_sources_normalizes_newlines(self, tmp_path):
+        """Test that Windows and old Mac line endings are normalized."""
+        path = tmp_path / "crlf.py"
+        path.write_bytes(b"a = 1\r\nb = 2\rc = 3\n")
+
+        converter = PrettipyConverter()
+        sources = converter._read_sources([path])
+
+        assert sources[path] == "a = 1\nb = 2\nc = 3\n"
+
+
+class TestEscapeHtml:
+    """Test cases for the _escape_html helper."""
+
+    def test_plain_string_passes_through(self):
+        """Test that strings without special characters are returned as-is."""
+        plain = "src/pkg/module.py"
+        assert _escape_html(plain) is plain
+
+    def test_special_characters_escaped(self):
+        """Test that special characters are escaped like html.escape."""
+        assert _escape_html("a<b>&'c\"") == "a&lt;b&gt;&amp;&#x27;c&quot;"
+
+
+class TestRelativeDisplayPath:
+    """Test cases for the _relative_display_path helper."""
+
+    def test_path_under_root(self, tmp_path):
+        """Test that paths under the root are shown relative to it."""
+        root_prefix = os.path.join(str(tmp_path), "")
+        path = tmp_path / "pkg" / "module.py"
+        assert _relative_display_path(path, root_prefix) == str(Path("pkg") / "module.py")
+
+    def test_path_outside_root(self, tmp_path):
+        """Test that paths outside the root, including sibling prefixes, stay unchanged."""
+        root_prefix = os.path.join(str(tmp_path / "proj"), "")
+        sibling = tmp_path / "project2" / "module.py"
+        assert _relative_display_path(sibling, root_prefix) == str(sibling)
+        assert _relative_display_path(Path("module.py"), root_prefix) == "module.py"
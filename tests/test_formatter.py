@@ -71,3 +71,47 @@ class TestCodeFormatter:
         for i in range(1, len(result)):
             stripped = result[i].lstrip()
             assert stripped.startswith("#"), f"Continuation line should start with #: {result[i]}"
+
+    def test_find_break_point_overlapping_breaks(self):
+        """Test that a break string only wins if it starts after the current best break ends."""
+        formatter = CodeFormatter(max_width=20)
+        assert formatter._find_break_point("call(a, (b, c)) + d + e", 0) == 18
+        # ", " ends at 4; " (" starts at 3, inside it, so ", " is kept
+        assert formatter._find_break_point("xx, (yy", 0) == 4
+        # Breaks at or before min_pos are ignored
+        assert formatter._find_break_point("    a, b", 4) == 7
+        assert formatter._find_break_point("    a, b", 5) == -1
+
+        # Adjacent break strings split at the earlier one
+        formatter = CodeFormatter(max_width=12)
+        assert formatter.wrap_line(' + ,  ["cyba [xa') == [
+            " + ,",
+            "     [",
+            '     "cyba [',
+            "     xa",
+        ]
+
+    def test_find_comment_break_at_last_fitting_space(self):
+        """Test that comments break just after the last space within the limit."""
+        formatter = CodeFormatter()
+        assert formatter._find_comment_break("# one two three", 10) == 10
+        assert formatter._find_comment_break("# one two three", 8) == 6
+        assert formatter._find_comment_break("#abcdefgh", 5) == -1
+        assert formatter._find_comment_break("# short", 20) == len("# short")
+
+    def test_wrap_plain_line_very_long_line(self):
+        """Test that a very long line wraps into continuation lines within the width."""
+        formatter = CodeFormatter(max_width=40)
+        line = "values = [" + ", ".join(f"item_{i}" for i in range(500)) + "]"
+        result = formatter._wrap_plain_line(line)
+        assert result[0].startswith("values = [")
+        assert all(r.startswith("    ") for r in result[1:])
+        assert all(len(r) <= 40 for r in result)
+        assert "".join(r.strip() for r in result).replace(" ", "") == line.replace(" ", "")
+
+    def test_wrap_plain_line_indent_wider_than_width(self):
+        """Test that wrapping terminates when the continuation indent exceeds the width."""
+        formatter = CodeFormatter(max_width=12)
+        line = " " * 10 + "call(alpha, beta, gamma)"
+        result = formatter._wrap_plain_line(line)
+        assert "".join(r.strip() for r in result) == "call(alpha,beta,gamma)"
@@ -14,10 +14,8 @@ class TestMixedProjectIntegration:
         """Return path to test project directory."""
         return Path(__file__).parent / "test_data" / "mixed_project"
 
-    def test_mixed_project_without_ipynb(self, test_project_dir, tmp_path):
+    def test_mixed_project_without_ipynb(self, test_project_dir, output_pdf):
         """Test converting mixed project without including notebooks."""
-        output_pdf = tmp_path / "output_no_ipynb.pdf"
-
         # Convert without including .ipynb files
         config = PrettipyConfig(include_ipynb=False)
         converter = PrettipyConverter(config)
@@ -30,7 +28,8 @@ class TestMixedProjectIntegration:
         # PDF should be reasonably sized (at least 10KB for 2 Python files)
         assert output_pdf.stat().st_size > 10_000
 
-    def test_mixed_project_with_ipynb(self, test_project_dir, tmp_path):
+    @pytest.mark.slow
+    def test_mixed_project_with_ipynb(self, test_project_dir, output_pdf):
         """Test converting mixed project including notebooks.
 
         This is the main integration test that verifies:
@@ -38,8 +37,6 @@ class TestMixedProjectIntegration:
         2. Both .py and .ipynb files are included
         3. Cross-references between files work correctly
         """
-        output_pdf = tmp_path / "output_with_ipynb.pdf"
-
         # Convert with .ipynb files included
         config = PrettipyConfig(include_ipynb=True)
         converter = PrettipyConverter(config)
@@ -52,10 +49,9 @@ class TestMixedProjectIntegration:
         # PDF should be larger when including notebooks (at least 30KB for 2 .py + 2 .ipynb files)
         assert output_pdf.stat().st_size > 30_000
 
-    def test_mixed_project_with_dependency_sorting(self, test_project_dir, tmp_path):
+    @pytest.mark.slow
+    def test_mixed_project_with_dependency_sorting(self, test_project_dir, output_pdf):
         """Test converting mixed project with dependency-based sorting."""
-        output_pdf = tmp_path / "output_sorted.pdf"
-
         # Convert with dependency sorting
         config = PrettipyConfig(include_ipynb=True, sort_method="dependency")
         converter = PrettipyConverter(config)
@@ -68,10 +64,9 @@ class TestMixedProjectIntegration:
         # PDF should still be properly sized
         assert output_pdf.stat().st_size > 30_000
 
-    def test_mixed_project_with_tree(self, test_project_dir, tmp_path):
+    @pytest.mark.slow
+    def test_mixed_project_with_tree(self, test_project_dir, output_pdf):
         """Test converting mixed project with directory tree."""
-        output_pdf = tmp_path / "output_with_tree.pdf"
-
         # Convert with directory tree and notebooks
         config = PrettipyConfig(include_ipynb=True, show_directory_tree=True)
         converter = PrettipyConverter(config)
@@ -84,10 +79,9 @@ class TestMixedProjectIntegration:
         # PDF should be properly sized with tree
         assert output_pdf.stat().st_size > 30_000
 
-    def test_mixed_project_with_linking(self, test_project_dir, tmp_path):
+    @pytest.mark.slow
+    def test_mixed_project_with_linking(self, test_project_dir, output_pdf):
         """Test that auto-linking works with mixed .py and .ipynb files."""
-        output_pdf = tmp_path / "output_with_linking.pdf"
-
         # Convert with linking enabled
         config = PrettipyConfig(include_ipynb=True, enable_linking=True)
         converter = PrettipyConverter(config)
@@ -124,11 +118,15 @@ class TestMixedProjectIntegration:
         assert any("analysis" in name for name in file_names)
         assert any("experiments" in name for name in file_names)
         assert len(files) == 4
-
-    def test_mixed_project_specific_files(self, test_project_dir, tmp_path):
+        # Each converted notebook maps back to its original .ipynb file
+        assert sorted(p.name for p in converter.ipynb_to_py_map.values()) == [
+            "analysis.ipynb",
+            "experiments.ipynb",
+        ]
+
+    @pytest.mark.slow
+    def test_mixed_project_specific_files(self, test_project_dir, output_pdf):
         """Test converting specific files from the mixed project."""
-        output_pdf = tmp_path / "output_specific.pdf"
-
         # Convert only specific files
         utils_py = test_project_dir / "utils.py"
         analysis_ipynb = test_project_dir / "analysis.ipynb"
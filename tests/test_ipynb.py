@@ -1,65 +1,48 @@
 """Tests for Jupyter notebook (.ipynb) support."""
 
 import pytest
-from pathlib import Path
 import json
+import os
+import tempfile
+from pathlib import Path
+from reportlab.platypus import SimpleDocTemplate
 from prettipy.core import PrettipyConverter
 from prettipy.config import PrettipyConfig
+from prettipy import ipynb_converter
 from prettipy.ipynb_converter import NotebookConverter
 
 
-class TestNotebookSupport:
-    """Test cases for .ipynb file support."""
+@pytest.fixture(scope="module")
+def notebook_path(tmp_path_factory, sample_notebook_bytes):
+    """Write the sample notebook once for tests that only read it."""
+    path = tmp_path_factory.mktemp("notebooks") / "test_notebook.ipynb"
+    path.write_bytes(sample_notebook_bytes)
+    return path
 
-    def create_sample_notebook(self, path: Path) -> None:
-        """Create a minimal valid Jupyter notebook for testing."""
-        notebook_content = {
-            "cells": [
-                {
-                    "cell_type": "code",
-                    "execution_count": 1,
-                    "metadata": {},
-                    "outputs": [],
-                    "source": ["print('Hello from notebook')\n", "x = 42\n"],
-                },
-                {
-                    "cell_type": "code",
-                    "execution_count": 2,
-                    "metadata": {},
-                    "outputs": [],
-                    "source": ["def add(a, b):\n", "    return a + b\n"],
-                },
-                {
-                    "cell_type": "markdown",
-                    "metadata": {},
-                    "source": [
-                        "# This is a markdown cell\n",
-                        "It should not appear in the Python output",
-                    ],
-                },
-            ],
-            "metadata": {
-                "kernelspec": {
-                    "display_name": "Python 3",
-                    "language": "python",
-                    "name": "python3",
-                },
-                "language_info": {"name": "python", "version": "3.8.0"},
-            },
-            "nbformat": 4,
-            "nbformat_minor": 4,
-        }
 
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(notebook_content, f, indent=2)
+@pytest.fixture(scope="module")
+def notebook_converter() -> NotebookConverter:
+    """Share one converter, and its lazily built IPython transformer, across tests."""
+    return NotebookConverter(verbose=True)
 
-    def test_notebook_converter_basic(self, tmp_path):
-        """Test basic notebook conversion."""
-        notebook_path = tmp_path / "test_notebook.ipynb"
-        self.create_sample_notebook(notebook_path)
 
-        converter = NotebookConverter(verbose=True)
-        python_code = converter.convert_notebook_to_python(notebook_path)
+@pytest.fixture
+def stub_pdf(monkeypatch):
+    """Build the story as usual but skip ReportLab's page layout, writing a stub PDF."""
+
+    def build(doc, flowables, *args, **kwargs):
+        assert flowables
+        Path(doc.filename).write_bytes(b"%PDF-1.4 stub")
+
+    monkeypatch.setattr(SimpleDocTemplate, "build", build)
+
+
+class TestNotebookSupport:
+    """Test cases for .ipynb file support."""
+
+    def test_notebook_converter_basic(self, sample_notebook_bytes, notebook_converter):
+        """Test basic notebook conversion from in-memory notebook contents."""
+        python_code = notebook_converter.convert_notebook_bytes_to_python(sample_notebook_bytes)
 
         assert python_code is not None
         assert "print('Hello from notebook')" in python_code
@@ -67,14 +50,81 @@ class TestNotebookSupport:
         # nbconvert's PythonExporter includes markdown cells as commented lines
         # This is expected behavior - we only exclude outputs, not markdown
         assert "# This is a markdown cell" in python_code
+        # Cell outputs are left out
+        assert "Output only" not in python_code
+
+    def test_notebook_converter_matches_nbconvert(self, tmp_path, sample_notebook_bytes):
+        """Test that direct conversion produces the same script as nbconvert."""
+        nbconvert = pytest.importorskip("nbconvert")
 
-    def test_notebook_converter_temp_file(self, tmp_path):
-        """Test creating temporary Python file from notebook."""
         notebook_path = tmp_path / "test_notebook.ipynb"
-        self.create_sample_notebook(notebook_path)
+        notebook_path.write_bytes(sample_notebook_bytes)
+        notebook = json.loads(notebook_path.read_text())
+        notebook["cells"] += [
+            {"cell_type": "raw", "metadata": {}, "source": "raw text\n"},
+            {
+                "cell_type": "code",
+                "execution_count": None,
+                "metadata": {},
+                "outputs": [],
+                "source": ["%matplotlib inline\n", "!ls\n"],
+            },
+            {
+                "cell_type": "code",
+                "execution_count": 3,
+                "metadata": {},
+                "outputs": [],
+                "source": [],
+            },
+        ]
+        notebook_path.write_bytes(json.dumps(notebook).encode("utf-8"))
 
-        converter = NotebookConverter(verbose=True)
-        temp_py_file = converter.create_temp_python_file(notebook_path)
+        expected, _ = nbconvert.PythonExporter().from_filename(str(notebook_path))
+
+        converter = NotebookConverter()
+        assert converter.convert_notebook_to_python(notebook_path) == expected
+
+    def test_old_notebook_format_uses_nbconvert(self, tmp_path):
+        """Test that nbformat 3 notebooks are upgraded and exported by nbconvert."""
+        nbconvert = pytest.importorskip("nbconvert")
+
+        notebook = {
+            "nbformat": 3,
+            "nbformat_minor": 0,
+            "metadata": {"name": "old"},
+            "worksheets": [
+                {
+                    "metadata": {},
+                    "cells": [
+                        {
+                            "cell_type": "code",
+                            "collapsed": False,
+                            "input": "x = 1",
+                            "language": "python",
+                            "metadata": {},
+                            "outputs": [],
+                        }
+                    ],
+                }
+            ],
+        }
+        first = tmp_path / "old.ipynb"
+        second = tmp_path / "old_copy.ipynb"
+        data = json.dumps(notebook).encode("utf-8")
+        first.write_bytes(data)
+        second.write_bytes(data)
+
+        expected, _ = nbconvert.PythonExporter().from_filename(str(first))
+
+        converter = NotebookConverter()
+        assert converter.convert_notebook_to_python(first) == expected
+        exporter = converter._exporter
+        assert converter.convert_notebook_to_python(second) == expected
+        assert converter._exporter is exporter
+
+    def test_notebook_converter_temp_file(self, notebook_path, notebook_converter):
+        """Test creating temporary Python file from notebook."""
+        temp_py_file = notebook_converter.create_temp_python_file(notebook_path)
 
         assert temp_py_file is not None
         assert temp_py_file.exists()
@@ -86,70 +136,76 @@ class TestNotebookSupport:
         content = temp_py_file.read_text()
         assert "print('Hello from notebook')" in content
 
-    def test_include_ipynb_disabled_by_default(self, tmp_path):
-        """Test that .ipynb files are not included by default."""
-        # Create a notebook
-        notebook_path = tmp_path / "test.ipynb"
-        self.create_sample_notebook(notebook_path)
+    def test_notebook_converter_temp_file_reused(
+        self, tmp_path, monkeypatch, sample_notebook_bytes
+    ):
+        """Test that an unchanged notebook reuses its temporary Python file."""
+        notebook_path = tmp_path / "cached_notebook.ipynb"
+        notebook_path.write_bytes(sample_notebook_bytes)
 
-        # Create a regular Python file
-        py_path = tmp_path / "test.py"
-        py_path.write_text("print('regular python')")
-
-        config = PrettipyConfig(include_ipynb=False)
-        converter = PrettipyConverter(config)
-        files = converter.find_python_files(tmp_path)
-
-        # Should only find the .py file
-        assert len(files) == 1
-        assert files[0].name == "test.py"
-
-    def test_include_ipynb_enabled(self, tmp_path):
-        """Test that .ipynb files are included when enabled."""
-        # Create a notebook
-        notebook_path = tmp_path / "test.ipynb"
-        self.create_sample_notebook(notebook_path)
-
-        # Create a regular Python file
-        py_path = tmp_path / "test.py"
-        py_path.write_text("print('regular python')")
+        converter = NotebookConverter()
+        temp_py_file = converter.create_temp_python_file(notebook_path)
+        assert temp_py_file is not None
 
-        config = PrettipyConfig(include_ipynb=True)
-        converter = PrettipyConverter(config)
+        def fail(path):
+            raise AssertionError("notebook converted again")
+
+        monkeypatch.setattr(converter, "convert_notebook_to_python", fail)
+        assert converter.create_temp_python_file(notebook_path) == temp_py_file
+
+        # Changing the notebook produces a fresh conversion
+        monkeypatch.undo()
+        notebook = json.loads(notebook_path.read_text())
+        notebook["cells"][0]["source"] = ["print('changed')\n"]
+        notebook_path.write_bytes(json.dumps(notebook).encode("utf-8"))
+        updated_py_file = converter.create_temp_python_file(notebook_path)
+        assert updated_py_file != temp_py_file
+        assert "print('changed')" in updated_py_file.read_text()
+
+    def test_notebook_converter_temp_file_keyed_by_converter(
+        self, tmp_path, monkeypatch, sample_notebook_bytes
+    ):
+        """Test that a new cache format does not reuse files from an earlier one."""
+        notebook_path = tmp_path / "versioned.ipynb"
+        notebook_path.write_bytes(sample_notebook_bytes)
+        temp_py_file = NotebookConverter().create_temp_python_file(notebook_path)
+
+        monkeypatch.setattr(ipynb_converter, "CACHE_FORMAT", ipynb_converter.CACHE_FORMAT + 1)
+        assert NotebookConverter().create_temp_python_file(notebook_path) != temp_py_file
+
+    @pytest.mark.skipif(not hasattr(os, "getuid"), reason="POSIX ownership checks")
+    def test_notebook_temp_dir_private(self, tmp_path, monkeypatch):
+        """Test that converted notebooks are only reused from a private directory."""
+        monkeypatch.setattr(tempfile, "gettempdir", lambda: str(tmp_path))
+        shared_dir = tmp_path / f"prettipy_notebooks-{os.getuid()}"
+
+        temp_dir = NotebookConverter._make_temp_dir()
+        assert temp_dir == shared_dir
+        assert temp_dir.stat().st_mode & 0o777 == 0o700
+
+        # A directory others can write to is not trusted
+        shared_dir.chmod(0o777)
+        temp_dir = NotebookConverter._make_temp_dir()
+        assert temp_dir != shared_dir
+        assert temp_dir.parent == tmp_path
+        assert list(temp_dir.iterdir()) == []
+
+    def test_include_ipynb_read_at_search_time(self, tmp_path, sample_notebook_bytes):
+        """Test that enabling notebooks after construction still finds them."""
+        (tmp_path / "analysis.ipynb").write_bytes(sample_notebook_bytes)
+
+        converter = PrettipyConverter(PrettipyConfig())
+        assert converter.find_python_files(tmp_path) == []
+
+        converter.config.include_ipynb = True
         files = converter.find_python_files(tmp_path)
-
-        # Should find both files (the .py and the converted notebook)
-        assert len(files) == 2
-
-        # Check that the mapping was created
-        # One of the files should be in the ipynb_to_py_map
-        assert len(converter.ipynb_to_py_map) == 1
-
-    def test_convert_directory_with_notebook(self, tmp_path):
-        """Test converting a directory with notebooks to PDF."""
-        # Create a notebook
-        notebook_path = tmp_path / "notebook.ipynb"
-        self.create_sample_notebook(notebook_path)
-
-        # Create a regular Python file
-        py_path = tmp_path / "script.py"
-        py_path.write_text("print('regular python')")
-
-        output_pdf = tmp_path / "output.pdf"
-
-        config = PrettipyConfig(include_ipynb=True, verbose=True)
-        converter = PrettipyConverter(config)
-        converter.convert_directory(str(tmp_path), str(output_pdf))
-
-        # Check that PDF was created
-        assert output_pdf.exists()
-        assert output_pdf.stat().st_size > 0
+        assert [converter.ipynb_to_py_map[f].name for f in files] == ["analysis.ipynb"]
 
     def test_invalid_notebook_handling(self, tmp_path):
         """Test that invalid notebooks are handled gracefully."""
         # Create an invalid notebook (not valid JSON)
         bad_notebook = tmp_path / "bad.ipynb"
-        bad_notebook.write_text("this is not valid JSON")
+        bad_notebook.write_bytes(b"this is not valid JSON")
 
         config = PrettipyConfig(include_ipynb=True, verbose=True)
         converter = PrettipyConverter(config)
@@ -159,19 +215,19 @@ class TestNotebookSupport:
         # (no temp file created for invalid notebook)
         assert len(files) == 0
 
-    def test_notebook_with_directory_tree(self, tmp_path):
-        """Test that notebooks appear in directory tree with proper links."""
+    def test_convert_directory_with_notebook(self, tmp_path, sample_notebook_bytes, stub_pdf):
+        """Test converting a directory with a nested notebook, linked from the tree, to PDF."""
         # Create a notebook in a subdirectory
         subdir = tmp_path / "notebooks"
         subdir.mkdir()
         notebook_path = subdir / "analysis.ipynb"
-        self.create_sample_notebook(notebook_path)
+        notebook_path.write_bytes(sample_notebook_bytes)
 
         # Create a regular Python file
         py_path = tmp_path / "script.py"
-        py_path.write_text("print('regular python')")
+        py_path.write_bytes(b"print('regular python')")
 
-        output_pdf = tmp_path / "with_tree.pdf"
+        output_pdf = tmp_path / "output.pdf"
 
         config = PrettipyConfig(include_ipynb=True, show_directory_tree=True, verbose=True)
         converter = PrettipyConverter(config)
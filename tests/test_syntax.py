@@ -1,145 +1,141 @@
 """Tests for the syntax highlighting module."""
 
+import html
+import re
+
 import pytest
-from prettipy.syntax import SyntaxHighlighter
+from pygments.token import Token
+from prettipy.formatter import CodeFormatter
+from prettipy.linking import SymbolTracker
+from prettipy.syntax import SyntaxHighlighter, _escape_token
 
+# Colors of the default scheme
+STRING = "#4070a0"
+KEYWORD = "#007020"
+COMMENT = "#60a0b0"
 
-class TestSyntaxHighlighter:
-    """Test cases for SyntaxHighlighter class."""
+_COLOR_RE = re.compile(r"#[0-9a-fA-F]{6}")
 
-    def test_empty_line(self):
-        """Test highlighting of empty lines."""
-        highlighter = SyntaxHighlighter()
-        result = highlighter.highlight_line("")
-        assert result == "<br/>"
 
-    def test_simple_assignment(self):
-        """Test highlighting of simple assignment."""
-        highlighter = SyntaxHighlighter()
-        result = highlighter.highlight_line("x = 1")
-        assert "font" in result or "nbsp" in result
-        assert isinstance(result, str)
+def _colors(highlighted: str) -> set:
+    """Return the set of colors used in a highlighted line."""
+    return set(_COLOR_RE.findall(highlighted))
 
-    def test_function_definition(self):
-        """Test highlighting of function definition."""
-        highlighter = SyntaxHighlighter()
-        result = highlighter.highlight_line("def hello():")
-        assert "font" in result
-        assert "color" in result
-        assert isinstance(result, str)
 
-    def test_comment(self):
-        """Test highlighting of comments."""
-        highlighter = SyntaxHighlighter()
-        result = highlighter.highlight_line("# This is a comment")
-        assert "font" in result
-        assert "color" in result
+@pytest.fixture(scope="module")
+def formatter():
+    """Share one formatter for the wrapped-line highlighting tests."""
+    return CodeFormatter(max_width=50)
 
-    def test_preserve_spaces(self):
-        """Test that spaces are preserved."""
-        highlighter = SyntaxHighlighter()
-        result = highlighter.highlight_line("    indented")
-        assert "nbsp" in result
 
-    def test_highlight_code_multiline(self):
+class TestSyntaxHighlighter:
+    """Test cases for SyntaxHighlighter class."""
+
+    @pytest.mark.parametrize(
+        "method, expected",
+        [("highlight_line", "<br/>"), ("highlight_code_multiline_aware", [])],
+    )
+    def test_empty_input(self, highlighter, method, expected):
+        """Test highlighting of an empty line and of empty code."""
+        assert getattr(highlighter, method)("") == expected
+
+    @pytest.mark.parametrize(
+        "line, expected_frags",
+        [
+            ("x = 1", ("nbsp",)),
+            ("def hello():", ("font", "color")),
+            ("# This is a comment", ("font", "color")),
+            ("    indented", ("nbsp",)),
+        ],
+    )
+    def test_highlight_line(self, highlighter, line, expected_frags):
+        """Test that single lines are highlighted with colors and preserved spaces."""
+        result = highlighter.highlight_line(line)
+        assert isinstance(result, str)
+        for frag in expected_frags:
+            assert frag in result
+
+    def test_escape_special_characters(self):
+        """Test that tokens are escaped like html.escape, with spaces and tabs preserved."""
+        for text in ["a & b", "x<y>z", 'say "hi"', "it's", "\tindent", "plain"]:
+            expected = html.escape(text).replace(" ", "&nbsp;").replace("\t", "&nbsp;" * 4)
+            assert _escape_token(text) == expected
+
+    def test_highlight_code_multiline(self, highlighter):
         """Test highlighting of multiple lines."""
-        highlighter = SyntaxHighlighter()
         code = "def hello():\n    print('world')"
         result = highlighter.highlight_code(code)
         assert "<br/>" in result
         assert "font" in result
 
-    def test_multiline_docstring_double_quotes(self):
-        """Test highlighting of triple-double-quoted docstrings."""
-        highlighter = SyntaxHighlighter()
-        code = '"""\nThis is a docstring.\nIt spans multiple lines.\n"""'
+    def test_highlight_code_single_pass(self, highlighter):
+        """Test that highlight_code keeps multiline strings and leading blank lines in place."""
+        code = '\n\ntext = """\nstill a string\n"""'
         lines = highlighter.highlight_code_multiline_aware(code)
 
-        # All lines should contain string color
-        string_color = "#4070a0"
-        assert string_color in lines[0], "Opening quotes should be highlighted"
-        assert string_color in lines[1], "First line of content should be highlighted as string"
-        assert string_color in lines[2], "Second line of content should be highlighted as string"
-        assert string_color in lines[3], "Closing quotes should be highlighted"
-
-    def test_multiline_docstring_single_quotes(self):
-        """Test highlighting of triple-single-quoted strings."""
-        highlighter = SyntaxHighlighter()
-        code = "'''\nMultiline string\nwith single quotes\n'''"
-        lines = highlighter.highlight_code_multiline_aware(code)
-
-        # All lines should contain string color
-        string_color = "#4070a0"
-        assert string_color in lines[0], "Opening quotes should be highlighted"
-        assert string_color in lines[1], "First line of content should be highlighted as string"
-        assert string_color in lines[2], "Second line of content should be highlighted as string"
-        assert string_color in lines[3], "Closing quotes should be highlighted"
-
-    def test_multiline_string_in_function(self):
-        """Test multiline string inside a function definition."""
-        highlighter = SyntaxHighlighter()
-        code = '''def example():
-    """
-    This is a function docstring.
-    It explains what the function does.
-    """
-    pass'''
+        assert highlighter.highlight_code(code) == "<br/>".join(lines)
+        assert lines[:2] == ["<br/>", "<br/>"]
+        assert lines[2].startswith("text")
+        assert '<font color="#4070a0">still&nbsp;a&nbsp;string</font>' == lines[3]
+
+    @pytest.mark.parametrize(
+        "code, expected_colors",
+        [
+            (
+                '"""\nThis is a docstring.\nIt spans multiple lines.\n"""',
+                {0: STRING, 1: STRING, 2: STRING, 3: STRING},
+            ),
+            (
+                "'''\nMultiline string\nwith single quotes\n'''",
+                {0: STRING, 1: STRING, 2: STRING, 3: STRING},
+            ),
+            (
+                'def example():\n    """\n    This is a function docstring.\n'
+                '    It explains what the function does.\n    """\n    pass',
+                {1: STRING, 2: STRING, 3: STRING, 4: STRING},
+            ),
+            (
+                '"""Module docstring"""\n\ndef func():\n    x = 1\n    return x',
+                {0: STRING, 2: KEYWORD},
+            ),
+        ],
+        ids=["double_quotes", "single_quotes", "in_function", "mixed_with_code"],
+    )
+    def test_multiline_string_highlight(self, highlighter, code, expected_colors):
+        """Test that multiline strings are highlighted on every line they span."""
         lines = highlighter.highlight_code_multiline_aware(code)
+        for index, color in expected_colors.items():
+            colors = _colors(lines[index])
+            assert color in colors, f"{color} missing in line {index}: {lines[index]}"
 
-        # Check that docstring lines are highlighted as strings
-        string_color = "#4070a0"
-        assert string_color in lines[1], "Opening docstring quotes should be highlighted"
-        assert string_color in lines[2], "Docstring content should be highlighted as string"
-        assert string_color in lines[3], "Docstring content should be highlighted as string"
-        assert string_color in lines[4], "Closing docstring quotes should be highlighted"
-
-    def test_empty_code(self):
-        """Test highlighting of empty code."""
-        highlighter = SyntaxHighlighter()
-        lines = highlighter.highlight_code_multiline_aware("")
-        assert lines == []
-
-    def test_mixed_strings_and_code(self):
-        """Test file with both multiline strings and regular code."""
+    def test_token_color_resolved_once_per_type(self):
+        """Test that token colors follow the scheme's parent types and are cached."""
         highlighter = SyntaxHighlighter()
-        code = '''"""Module docstring"""
-
-def func():
-    x = 1
-    return x'''
-        lines = highlighter.highlight_code_multiline_aware(code)
-
-        # First line should have string highlighting
-        assert "#4070a0" in lines[0]
-        # Empty line
-        assert lines[1] == "<br/>"
-        # Function definition should have keyword highlighting
-        assert "#007020" in lines[2]  # 'def' keyword color
-
-    def test_wrapped_comment_highlighting(self):
+        assert highlighter._get_token_color(Token.String.Double) == "#4070a0"
+        assert highlighter._get_token_color(Token.Punctuation) is None
+        assert highlighter._color_cache == {
+            Token.String.Double: "#4070a0",
+            Token.Punctuation: None,
+        }
+
+    def test_highlighters_share_lexer(self):
+        """Test that highlighters and symbol trackers reuse one newline-preserving lexer."""
+        lexer = SyntaxHighlighter().lexer
+        assert SyntaxHighlighter(enable_linking=False).lexer is lexer
+        assert SymbolTracker().lexer is lexer
+        assert lexer.stripnl is False
+
+    def test_wrapped_comment_highlighting(self, highlighter, formatter):
         """Test that wrapped comment lines maintain comment color."""
-        from prettipy.formatter import CodeFormatter
-
-        highlighter = SyntaxHighlighter()
-        formatter = CodeFormatter(max_width=50)
-
         # Long comment that will be wrapped
         line = "# We can also plot average attention across all heads and layers"
-        wrapped_lines = formatter.wrap_line(line)
-
-        # Highlight each wrapped line
-        for wrapped_line in wrapped_lines:
-            highlighted = highlighter.highlight_line(wrapped_line)
+        for wrapped_line in formatter.wrap_line(line):
+            colors = _colors(highlighter.highlight_line(wrapped_line))
             # All wrapped comment lines should have comment color
-            assert "#60a0b0" in highlighted, f"Comment color missing in: {wrapped_line}"
+            assert COMMENT in colors, f"Comment color missing in: {wrapped_line}"
 
-    def test_wrapped_inline_comment_highlighting(self):
+    def test_wrapped_inline_comment_highlighting(self, highlighter, formatter):
         """Test that wrapped inline comments maintain comment color on continuation."""
-        from prettipy.formatter import CodeFormatter
-
-        highlighter = SyntaxHighlighter()
-        formatter = CodeFormatter(max_width=50)
-
         # Inline comment that will be wrapped
         line = "x = 1  # This is a very long inline comment that should wrap"
         wrapped_lines = formatter.wrap_line(line)
@@ -148,9 +144,7 @@ def func():
         assert len(wrapped_lines) > 1
 
         # All lines with comments should have comment color
-        for i, wrapped_line in enumerate(wrapped_lines):
+        colors_per_line = [_colors(highlighter.highlight_line(w)) for w in wrapped_lines]
+        for i, (wrapped_line, colors) in enumerate(zip(wrapped_lines, colors_per_line)):
             if "#" in wrapped_line:
-                highlighted = highlighter.highlight_line(wrapped_line)
-                assert (
-                    "#60a0b0" in highlighted
-                ), f"Comment color missing in line {i}: {wrapped_line}"
+                assert COMMENT in colors, f"Comment color missing in line {i}: {wrapped_line}"
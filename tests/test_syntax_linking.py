@@ -125,3 +125,26 @@ msg = "hello world" """
         # (Pygments will tokenize it as String, not Name)
         # So there should be no href to hello in this line
         assert result.count('<a href="#def_hello">') == 0
+
+    def test_linking_pass_tokens_reused_once(self):
+        """Test that highlighting reuses the linking pass tokens for the same code."""
+        code = "def greet():\n    pass\n\ngreet()"
+        fresh = SyntaxHighlighter(enable_linking=True)
+        fresh.prepare_for_linking(code)
+        fresh.symbol_tracker.mark_anchor_created("greet")
+
+        highlighter = SyntaxHighlighter(enable_linking=True)
+        highlighter.prepare_for_linking(code, keep_tokens=True)
+        assert code in highlighter._token_cache
+        highlighter.symbol_tracker.mark_anchor_created("greet")
+
+        expected = fresh.highlight_code_multiline_aware(code)
+        assert highlighter.highlight_code_multiline_aware(code) == expected
+        assert code not in highlighter._token_cache
+
+    def test_linking_pass_keeps_no_tokens_by_default(self):
+        """Test that prepare_for_linking only keeps tokens when asked to."""
+        highlighter = SyntaxHighlighter(enable_linking=True)
+        highlighter.prepare_for_linking("def greet():\n    pass")
+        assert "greet" in highlighter.symbol_tracker.definitions
+        assert highlighter._token_cache == {}
@@ -101,6 +101,22 @@ class TestDirectoryTreeGenerator:
             # The link should be present
             assert '<a href="#' in tree_html or "test.py" in tree_html
 
+    def test_generate_linked_tree_html_skips_files_outside_root(self, tmp_path):
+        """Test that only files under the root are linked from the tree."""
+        root = tmp_path / "project"
+        root.mkdir()
+        inside = root / "inside.py"
+        inside.write_text("x = 1")
+        outside = tmp_path / "outside.py"
+        outside.write_text("y = 2")
+
+        generator = DirectoryTreeGenerator()
+        tree_html, file_to_anchor = generator.generate_linked_tree_html(root, [outside, inside])
+
+        anchor = file_to_anchor["inside.py"]
+        assert f'<a href="#{anchor}" color="blue"><u>inside.py</u></a>' in tree_html
+        assert tree_html.count("<a href=") == 1
+
     def test_generate_tree_with_exclude_dirs(self, tmp_path):
         """Test generating tree with excluded directories."""
         # Create structure with directory to exclude